@@ -0,0 +1,191 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import persistence
+
+logger = logging.getLogger(__name__)
+
+# Estados de guardado que se muestran en la barra lateral
+PENDING = "Pendiente"
+SAVING = "Guardando"
+SAVED = "Guardado"
+FAILED = "Error"
+
+
+# Cola de guardado diferido (write-behind): junta los cambios de cada sesión,
+# espera a que dejen de llegar (debounce) y los guarda en lote en un hilo aparte
+class AutosaveQueue:
+    def __init__(self, save, debounce=2.0, max_delay=10.0, max_retries=5, max_backoff=30.0, workers=4, state_ttl=3600.0):
+        self._save = save
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._max_retries = max_retries
+        self._max_backoff = max_backoff
+        # session_id -> {"user_info", "changes", "first", "due"}
+        self._pending = {}
+        # session_id -> {"status", "time", "error"}; se descartan state_ttl segundos después
+        # del último cambio si la sesión no tiene nada pendiente
+        self._states = {}
+        self._state_ttl = state_ttl
+        self._pruned = time.time()
+        # Sesiones con un guardado en curso (se guardan de a una para respetar el orden)
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="autosave-write")
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush_all)
+
+    # Encolar cambios (control -> status) de una sesión
+    def submit(self, session_id, user_info, changes):
+        if not changes:
+            return
+        now = time.monotonic()
+        with self._condition:
+            batch = self._pending.get(session_id)
+            if batch is None:
+                batch = self._pending[session_id] = {"changes": {}, "first": now}
+            batch["user_info"] = {"name": user_info["name"], "company": user_info["company"]}
+            batch["changes"].update(changes)
+            # Esperar a que el usuario deje de cambiar, sin postergar el guardado indefinidamente
+            batch["due"] = min(now + self._debounce, batch["first"] + self._max_delay)
+            self._set_state(session_id, PENDING)
+            self._condition.notify_all()
+
+    # Adelantar el guardado de una sesión sin esperar el debounce
+    def flush(self, session_id):
+        with self._condition:
+            if session_id in self._pending:
+                self._pending[session_id]["due"] = 0
+                self._condition.notify_all()
+
+    # Estado de guardado de una sesión (o None si nunca encoló cambios)
+    def state(self, session_id):
+        with self._condition:
+            state = self._states.get(session_id)
+            return dict(state) if state else None
+
+    # Guardar de inmediato todo lo pendiente (al cerrar el proceso), una vez por sesión, y
+    # esperar los guardados en curso. Si una sesión tiene un guardado en curso, su lote
+    # pendiente se escribe después de que termine, para respetar el orden
+    def flush_all(self):
+        done = set()
+        while True:
+            with self._condition:
+                while True:
+                    session_ids = [session_id for session_id in self._pending if session_id not in done]
+                    ready = [session_id for session_id in session_ids if session_id not in self._in_flight]
+                    if ready or not (session_ids or self._in_flight):
+                        break
+                    self._condition.wait(1.0)
+                if not ready:
+                    return
+                batches = {session_id: self._take(session_id) for session_id in ready}
+                self._in_flight.update(ready)
+            done.update(ready)
+            for session_id, batch in batches.items():
+                try:
+                    self._write(session_id, batch, retries=1)
+                finally:
+                    self._release(session_id)
+
+    def _set_state(self, session_id, status, error=None):
+        now = time.time()
+        self._states[session_id] = {"status": status, "time": now, "error": error}
+        if now - self._pruned >= self._state_ttl:
+            self._prune(now)
+
+    # Descartar los estados de las sesiones sin cambios pendientes ni guardados en curso
+    def _prune(self, now):
+        self._pruned = now
+        expired = [
+            session_id for session_id, state in self._states.items()
+            if now - state["time"] >= self._state_ttl and session_id not in self._pending and session_id not in self._in_flight
+        ]
+        for session_id in expired:
+            del self._states[session_id]
+
+    # Sacar de la cola el lote de una sesión (con el lock tomado)
+    def _take(self, session_id):
+        batch = self._pending.pop(session_id)
+        self._set_state(session_id, SAVING)
+        return batch
+
+    # Marcar como terminado el guardado en curso de una sesión
+    def _release(self, session_id):
+        with self._condition:
+            self._in_flight.discard(session_id)
+            self._condition.notify_all()
+
+    # Devolver a la cola los cambios que no se pudieron guardar sin pisar otros más nuevos
+    def _requeue(self, session_id, batch, delay):
+        with self._condition:
+            newer = self._pending.get(session_id)
+            if newer:
+                batch["changes"].update(newer["changes"])
+                batch["user_info"] = newer["user_info"]
+            batch["first"] = time.monotonic()
+            batch["due"] = batch["first"] + delay
+            self._pending[session_id] = batch
+            self._condition.notify_all()
+
+    # Guardar un lote reintentando con espera exponencial acotada
+    def _write(self, session_id, batch, retries):
+        for attempt in range(retries):
+            try:
+                self._save(batch["user_info"], batch["changes"])
+            except Exception as error:
+                logger.warning("Autoguardado fallido (%s, intento %d): %s", session_id, attempt + 1, error)
+                with self._condition:
+                    self._set_state(session_id, FAILED, str(error))
+                if attempt + 1 < retries:
+                    time.sleep(min(self._max_backoff, 0.5 * 2 ** attempt))
+                continue
+            with self._condition:
+                if session_id not in self._pending:
+                    self._set_state(session_id, SAVED)
+            return True
+        # Conservar los cambios para el siguiente intento
+        self._requeue(session_id, batch, self._max_backoff)
+        return False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    waiting = {session_id: batch for session_id, batch in self._pending.items() if session_id not in self._in_flight}
+                    due = [session_id for session_id, batch in waiting.items() if batch["due"] <= now]
+                    if due:
+                        break
+                    timeout = min((batch["due"] for batch in waiting.values()), default=now + 60) - now
+                    self._condition.wait(timeout)
+                # Sacar los lotes en el mismo bloque en que se marcan en curso, para que
+                # flush_all no los tome en el medio
+                batches = {session_id: self._take(session_id) for session_id in due}
+                self._in_flight.update(due)
+            for session_id, batch in batches.items():
+                self._executor.submit(self._write_in_flight, session_id, batch)
+
+    def _write_in_flight(self, session_id, batch):
+        try:
+            self._write(session_id, batch, self._max_retries)
+        finally:
+            self._release(session_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# Cola compartida por todas las sesiones del proceso
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = AutosaveQueue(persistence.save_changes)
+    return _queue
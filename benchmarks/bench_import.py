@@ -0,0 +1,50 @@
+# Benchmark del importador: genera N libros con el formato anterior y mide filas/s.
+# Uso: MONGODB_URI=mongomock:// python benchmarks/bench_import.py --files 200 --workers 4
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+
+import importer
+import persistence
+from catalog import catalog, status_options
+
+
+# Libro como los que generaba save_to_excel: columnas control (texto completo) y status
+def write_legacy_workbook(path, rng):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["control", "status"])
+    for control in catalog.controls:
+        sheet.append([control.text, rng.choice(status_options)])
+    workbook.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filas por segundo del importador de planillas")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    collection = persistence.get_client()["sgsi_benchmark"]["respuestas"]
+    collection.delete_many({})
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(args.files):
+            write_legacy_workbook(os.path.join(directory, f"usuario {index}{importer.SUFFIX}"), rng)
+        stats = importer.import_directory(directory, "benchmark", args.workers, collection=collection, progress=lambda line: None)
+        again = importer.import_directory(directory, "benchmark", args.workers, collection=collection, progress=lambda line: None)
+
+    print(f"archivos={stats['files']} filas={stats['rows']} tiempo={stats['seconds']:.2f}s "
+          f"throughput={stats['rows'] / stats['seconds']:.0f} filas/s insertadas={stats['inserted']}")
+    print(f"reimportación: {again['skipped']} evaluaciones ya existentes, {again['inserted']} nuevas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Prueba de carga headless de app.py con AppTest y MongoDB en memoria: N sesiones intercaladas
+# (un rerun de cada una por turno, compartiendo cachés, autoguardado y base de datos) completan todos los requisitos y controles del Anexo A, cambian de sección, abren Métricas y guardan.
+# Reporta latencia de rerun p50/p95/p99 por página, memoria por sesión y operaciones de MongoDB
+# por sesión, escribe los resultados en JSON y los compara con una línea base. Las latencias
+# dependen de la máquina: la línea base se registra en cada máquina (no se versiona) y solo
+# se compara con una corrida de la misma configuración.
+# Uso: python benchmarks/bench_load.py --update-baseline   (una vez por máquina)
+#      python benchmarks/bench_load.py --sessions 8
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+
+import mongomock
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+import autosave
+import persistence
+from catalog import catalog, status_options
+
+APP_PATH = os.path.join(os.path.dirname(__file__), "..", "app.py")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline_load.json")
+
+# Métodos de la colección que equivalen a un viaje a MongoDB
+MONGO_OPERATIONS = [
+    "aggregate", "bulk_write", "count_documents", "create_index", "delete_many", "distinct",
+    "find", "find_one", "insert_many", "insert_one", "update_many", "update_one"
+]
+
+_operations = 0
+_operations_lock = threading.Lock()
+_depth = threading.local()
+
+
+# Contar las operaciones de mongomock (sin contar las llamadas internas entre sus métodos)
+def count_mongo_operations():
+    def counted(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            global _operations
+            depth = getattr(_depth, "value", 0)
+            if depth == 0:
+                with _operations_lock:
+                    _operations += 1
+            _depth.value = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _depth.value = depth
+        return wrapper
+
+    for name in MONGO_OPERATIONS:
+        setattr(mongomock.collection.Collection, name, counted(getattr(mongomock.collection.Collection, name)))
+
+
+# Pasos de una sesión completa; cada rerun registra su latencia en timings[página] y cede el turno
+def session_steps(session, timings):
+    rng = random.Random(session)
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+
+    def rerun(page, action=None):
+        if action:
+            action()
+        start = time.perf_counter()
+        at.run()
+        timings[page].append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"sesión {session}, {page}: {at.exception[0].value}")
+        return at
+
+    yield rerun("Introducción")
+    at.text_input[0].input(f"usuario{session}")
+    at.text_input[1].input("benchmark")
+    yield rerun("Introducción", next(button for button in at.button if button.label == "Guardar y continuar").click)
+
+    for section in catalog.sections:
+        yield rerun(section.title, lambda: at.sidebar.radio[0].set_value(section.title))
+        for family in section.families:
+            # Abrir la familia y responder cada control
+            at.session_state[f"familia_{family.id}"] = True
+            yield rerun(section.title)
+            for code in family.codes:
+                at.session_state[f"familia_{family.id}"] = True
+                yield rerun("status", lambda: at.selectbox(key=code).set_value(rng.choice(status_options)))
+            at.session_state[f"familia_{family.id}"] = False
+
+    yield rerun("Métricas", lambda: at.sidebar.radio[0].set_value("Métricas"))
+    yield rerun("Guardar", next(button for button in at.sidebar.button if button.label == "Guardar en MongoDB").click)
+
+
+# Ejecutar sesiones intercaladas; devuelve el AppTest de cada una
+def run_sessions(sessions, timings=None):
+    timings = defaultdict(list) if timings is None else timings
+    running = deque((session, session_steps(session, timings)) for session in sessions)
+    finished = {}
+    while running:
+        session, steps = running.popleft()
+        try:
+            finished[session] = next(steps)
+        except StopIteration:
+            continue
+        running.append((session, steps))
+    return list(finished.values())
+
+
+def percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "reruns": len(values)}
+
+
+# Bytes asignados por sesión, con las sesiones vivas al tomar la segunda instantánea
+def memory_per_session(sessions, offset):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = run_sessions(range(offset, offset + sessions))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return allocated / sessions
+
+
+# Parámetros de la corrida que deben coincidir con los de la línea base
+CONFIGURATION = ("sessions", "memory_sessions")
+
+
+# Métricas que superan la línea base por más de la tolerancia
+def regressions(results, baseline, tolerance):
+    different = [f"{name}={results[name]} (línea base {baseline.get(name)})"
+                 for name in CONFIGURATION if baseline.get(name) != results[name]]
+    if different:
+        raise SystemExit("la línea base se registró con otra configuración: " + ", ".join(different)
+                         + "; repetir con los mismos parámetros o actualizarla con --update-baseline")
+    found = []
+    for page, stats in results["pages"].items():
+        reference = baseline.get("pages", {}).get(page)
+        if reference and stats["p95"] > reference["p95"] * (1 + tolerance):
+            found.append(f"{page}: p95 {stats['p95'] * 1000:.1f}ms (línea base {reference['p95'] * 1000:.1f}ms)")
+    for metric in ("memory_per_session", "mongo_operations_per_session"):
+        if metric in baseline and results[metric] > baseline[metric] * (1 + tolerance):
+            found.append(f"{metric}: {results[metric]:,.0f} (línea base {baseline[metric]:,.0f})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de rerun, memoria y operaciones de MongoDB por sesión bajo carga")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--memory-sessions", type=int, default=2, help="sesiones medidas con tracemalloc")
+    parser.add_argument("--output", help="archivo JSON con los resultados")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="línea base de esta máquina")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="aumento permitido sobre la línea base")
+    parser.add_argument("--update-baseline", action="store_true", help="guardar los resultados como nueva línea base")
+    args = parser.parse_args()
+
+    count_mongo_operations()
+    persistence.get_collection().delete_many({})
+    persistence.get_history_collection().delete_many({})
+    # Compilar el script y cargar los módulos antes de medir
+    run_sessions([-1])
+    autosave.get_queue().flush_all()
+
+    global _operations
+    _operations = 0
+    timings = defaultdict(list)
+    start = time.perf_counter()
+    run_sessions(range(args.sessions), timings)
+    autosave.get_queue().flush_all()
+    elapsed = time.perf_counter() - start
+    operations = _operations
+
+    results = {
+        "sessions": args.sessions,
+        "memory_sessions": args.memory_sessions,
+        "seconds": elapsed,
+        "pages": {page: percentiles(values) for page, values in timings.items()},
+        "memory_per_session": memory_per_session(args.memory_sessions, args.sessions),
+        "mongo_operations_per_session": operations / args.sessions
+    }
+
+    print(f"sesiones={args.sessions} tiempo={elapsed:.1f}s")
+    for page, stats in results["pages"].items():
+        print(f"  {page:<50} p50={stats['p50'] * 1000:7.1f}ms p95={stats['p95'] * 1000:7.1f}ms "
+              f"p99={stats['p99'] * 1000:7.1f}ms reruns={stats['reruns']}")
+    print(f"memoria={results['memory_per_session']:,.0f} bytes/sesión "
+          f"mongo={results['mongo_operations_per_session']:.1f} operaciones/sesión")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"línea base actualizada en {args.baseline}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline:
+            found = regressions(results, json.load(baseline), args.tolerance)
+        if found:
+            raise SystemExit("regresiones respecto de la línea base:\n  " + "\n  ".join(found))
+        print("sin regresiones respecto de la línea base")
+    else:
+        print(f"sin línea base en {args.baseline}; registrarla con --update-baseline")
+
+
+if __name__ == "__main__":
+    main()
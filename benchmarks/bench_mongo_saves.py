@@ -0,0 +1,52 @@
+# Benchmark de guardados concurrentes en MongoDB.
+# Uso: MONGODB_URI=mongomock:// python benchmarks/bench_mongo_saves.py --sessions 50 --saves 20
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+
+import persistence
+
+STATUSES = ["Desconocido", "Inexistente", "Inicial", "Limitado", "Definido", "Gestionado", "Optimizado", "No Aplica"]
+CONTROLS = [f"A.{family}.{number}" for family, size in ((5, 37), (6, 8), (7, 14), (8, 34)) for number in range(1, size + 1)]
+
+
+# Una sesión que guarda varias veces unos pocos cambios
+def run_session(session, saves, changes_per_save, collection):
+    user_info = {"name": f"usuario{session}", "company": "benchmark"}
+    rng = random.Random(session)
+    for _ in range(saves):
+        changes = {control: rng.choice(STATUSES) for control in rng.sample(CONTROLS, changes_per_save)}
+        persistence.save_changes(user_info, changes, collection=collection)
+    return saves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de save_changes con N sesiones concurrentes")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--saves", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=5)
+    args = parser.parse_args()
+
+    collection = persistence.get_client()["sgsi_benchmark"]["respuestas"]
+    collection.delete_many({})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        total = sum(executor.map(
+            lambda session: run_session(session, args.saves, args.changes, collection),
+            range(args.sessions)
+        ))
+    elapsed = time.perf_counter() - start
+
+    print(f"sesiones={args.sessions} guardados={total} tiempo={elapsed:.2f}s "
+          f"throughput={total / elapsed:.1f} guardados/s documentos={collection.count_documents({})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmark del tiempo hasta el primer render de un usuario que vuelve: desde "Guardar y continuar"
+# hasta la página con sus respuestas recuperadas, sin caché y con la caché del proceso.
+# Uso: python benchmarks/bench_resume.py --assessments 5000 --budget 1.0
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+
+from streamlit.testing.v1 import AppTest
+
+import persistence
+from catalog import catalog, status_options
+
+APP_PATH = os.path.join(os.path.dirname(__file__), "..", "app.py")
+
+
+# Evaluaciones completas guardadas con clave estable
+def seed(collection, assessments):
+    rng = random.Random(0)
+    collection.delete_many({})
+    collection.insert_many([
+        {
+            "_id": persistence.assessment_key({"name": f"usuario{index}", "company": "benchmark"}),
+            "user_info": {"name": f"usuario{index}", "company": "benchmark"},
+            "responses": [{"control": control.code, "status": rng.choice(status_options)} for control in catalog.controls]
+        }
+        for index in range(assessments)
+    ])
+
+
+# Segundos desde el clic en "Guardar y continuar" hasta terminar el render con las respuestas recuperadas
+def time_to_first_render(name):
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.run()
+    at.text_input[0].input(name)
+    at.text_input[1].input("benchmark")
+    next(button for button in at.button if button.label == "Guardar y continuar").click()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if len(at.session_state["answers"]) != len(catalog):
+        raise SystemExit(f"no se recuperaron las respuestas de {name}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer render al retomar una evaluación")
+    parser.add_argument("--assessments", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="máximo de segundos permitido")
+    args = parser.parse_args()
+
+    seed(persistence.get_collection(), args.assessments)
+    # Primera ejecución para compilar el script y cargar los módulos
+    time_to_first_render("usuario0")
+
+    cold = [time_to_first_render(f"usuario{index}") for index in range(1, args.runs + 1)]
+    cached = [time_to_first_render(f"usuario{index}") for index in range(1, args.runs + 1)]
+    worst = max(cold + cached)
+    print(f"evaluaciones={args.assessments} sin caché={max(cold):.3f}s con caché={max(cached):.3f}s presupuesto={args.budget:.3f}s")
+    if worst > args.budget:
+        raise SystemExit(f"el primer render tardó {worst:.3f}s, por encima del presupuesto de {args.budget:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Benchmark de memoria por sesión: lista de dicts con el texto completo vs AnswerStore compacto.
+# Uso: python benchmarks/bench_session_memory.py --sessions 500
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from catalog import catalog, status_options
+from store import AnswerStore
+
+
+# Representación anterior: un dict {"control": texto, "status": status} por respuesta
+def legacy_session(rng):
+    return [{"control": control.text, "status": rng.choice(status_options)} for control in catalog.controls]
+
+
+def compact_session(rng):
+    store = AnswerStore()
+    for control in catalog.controls:
+        store.upsert(control.code, rng.choice(status_options))
+    store.take_changes()
+    return store
+
+
+# Bytes asignados por sesión al construir N sesiones completas
+def measure(build, sessions):
+    rng = random.Random(0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build(rng) for _ in range(sessions)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return allocated / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por sesión de una evaluación completa")
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+
+    legacy = measure(legacy_session, args.sessions)
+    compact = measure(compact_session, args.sessions)
+    print(f"controles={len(catalog)} sesiones={args.sessions}")
+    print(f"antes (lista de dicts):  {legacy:,.0f} bytes/sesión")
+    print(f"después (AnswerStore):   {compact:,.0f} bytes/sesión ({legacy / compact:.1f}x menos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmark de arranque en frío: importación de Streamlit y primer render de app.py (Introducción)
+# bajo AppTest, cada corrida en un proceso nuevo y con una base de datos inalcanzable.
+# Uso: python benchmarks/bench_startup.py --runs 5 --max-render 1.0
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app.py")
+
+# Dependencias que no deben cargarse para dibujar la Introducción
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "pymongo", "fpdf", "openpyxl", "xlsxwriter", "pyarrow"]
+
+# Se ejecuta en el proceso hijo; imprime una línea JSON con los tiempos
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+rendered = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "render": rendered - imported,
+    "errors": [str(error.value) for error in at.exception],
+    "heavy": [module for module in sys.argv[2:] if module in sys.modules]
+}))
+"""
+
+
+def cold_start():
+    # Un servidor que no responde: el primer render no debe esperar a MongoDB
+    env = dict(os.environ, MONGODB_URI="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=2000")
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, APP_PATH, *HEAVY_MODULES],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío y primer render de app.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-render", type=float, default=1.0, help="máximo de segundos para el primer render (mediana)")
+    args = parser.parse_args()
+
+    runs = [cold_start() for _ in range(args.runs)]
+    imports = statistics.median(run["import"] for run in runs)
+    render = statistics.median(run["render"] for run in runs)
+    heavy = sorted({module for run in runs for module in run["heavy"]})
+    errors = sorted({error for run in runs for error in run["errors"]})
+    print(f"corridas={args.runs} importación={imports:.3f}s primer render={render:.3f}s presupuesto={args.max_render:.3f}s")
+    print(f"dependencias pesadas cargadas: {', '.join(heavy) or 'ninguna'}")
+
+    failures = []
+    if errors:
+        failures.append(f"errores en el primer render: {errors}")
+    if heavy:
+        failures.append(f"la Introducción cargó {', '.join(heavy)}")
+    if render > args.max_render:
+        failures.append(f"el primer render tardó {render:.3f}s, por encima del presupuesto de {args.max_render:.3f}s")
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
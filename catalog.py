@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+
+# Catálogo por defecto: cláusulas y controles del Anexo A de ISO/IEC 27001:2022
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+# Código al inicio del texto de un control: "A.5.21 ...", "6.1.2 ...", "4.2 (a) ..."
+_CODE_PATTERN = re.compile(r"^\s*(A\.\d+\.\d+|\d+(?:\.\d+)*)(?:\s*\((\w)\))?")
+
+
+class Status(NamedTuple):
+    name: str
+    color: str
+    meaning: str
+
+
+class Control(NamedTuple):
+    code: str
+    text: str
+    family: str
+    section: str
+    slot: int
+    attributes: MappingProxyType
+
+
+class Group(NamedTuple):
+    title: str
+    controls: tuple
+
+
+class Family(NamedTuple):
+    id: str
+    title: str
+    section: str
+    groups: tuple
+    codes: tuple
+
+
+class Section(NamedTuple):
+    id: str
+    title: str
+    families: tuple
+
+
+# Catálogo inmutable de un marco de controles con sus índices precalculados
+class Catalog:
+    def __init__(self, data):
+        self.framework = data["framework"]
+        self.version = data["version"]
+        self.statuses = tuple(Status(sys.intern(s["name"]), s["color"], s["meaning"]) for s in data["statuses"])
+
+        controls = []
+        sections = []
+        for section_data in data["sections"]:
+            section_id = sys.intern(section_data["id"])
+            families = []
+            for family_data in section_data["families"]:
+                family_id = sys.intern(family_data["id"])
+                groups = []
+                for group_data in family_data["groups"]:
+                    group_controls = []
+                    for control_data in group_data["controls"]:
+                        control = Control(
+                            code=sys.intern(control_data["code"]),
+                            text=sys.intern(control_data["text"]),
+                            family=family_id,
+                            section=section_id,
+                            slot=len(controls),
+                            attributes=MappingProxyType(control_data.get("attributes", {}))
+                        )
+                        controls.append(control)
+                        group_controls.append(control)
+                    groups.append(Group(group_data["title"], tuple(group_controls)))
+                codes = tuple(control.code for group in groups for control in group.controls)
+                families.append(Family(family_id, family_data["title"], section_id, tuple(groups), codes))
+            sections.append(Section(section_id, section_data["title"], tuple(families)))
+
+        self.controls = tuple(controls)
+        self.sections = tuple(sections)
+        # Índices: código -> control, texto -> control, familia -> familia (con sus códigos en orden)
+        self._by_code = MappingProxyType({control.code: control for control in controls})
+        self._by_text = MappingProxyType({control.text: control for control in controls})
+        self.families = MappingProxyType({family.id: family for section in sections for family in section.families})
+        self._sections = MappingProxyType({section.id: section for section in sections})
+
+    def __len__(self):
+        return len(self.controls)
+
+    # Control por código ("A.5.21")
+    def control(self, code):
+        return self._by_code[code]
+
+    # Título (texto completo) de un control
+    def title(self, code):
+        return self._by_code[code].text
+
+    # Familia de cláusulas de un control ("4", "A.5", ...)
+    def family(self, code):
+        return self._by_code[code].family
+
+    # Códigos de una familia en el orden del catálogo
+    def codes(self, family):
+        return self.families[family].codes
+
+    def section(self, section_id):
+        return self._sections[section_id]
+
+    # Buscar un control por código o por texto (p. ej. respuestas guardadas con el texto completo)
+    def find(self, value):
+        value = value.strip()
+        control = self._by_code.get(value) or self._by_text.get(value)
+        if control is None:
+            match = _CODE_PATTERN.match(value)
+            if match:
+                code = match.group(1) + (f"({match.group(2)})" if match.group(2) else "")
+                control = self._by_code.get(code)
+        return control
+
+
+# Cargar un catálogo una sola vez por proceso
+@lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_PATH):
+    with open(path, encoding="utf-8") as catalog_file:
+        return Catalog(json.load(catalog_file))
+
+
+catalog = load_catalog()
+
+# Opciones de estado y colores
+status_options = [status.name for status in catalog.statuses]
+status_colors = {status.name: status.color for status in catalog.statuses}
+status_meanings = {status.name: status.meaning for status in catalog.statuses}
@@ -0,0 +1,59 @@
+import io
+from functools import lru_cache
+
+from matplotlib.figure import Figure
+
+from catalog import status_options, status_colors
+
+# Cantidad máxima de gráficos distintos en caché (compartida por todas las sesiones)
+CACHE_SIZE = 256
+
+
+# Convertir una figura en bytes PNG
+def _to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+# Gráfico de torta de un histograma de status (tupla en el orden de status_options).
+# Las figuras se crean sin pyplot, así que no quedan registradas ni abiertas al terminar.
+@lru_cache(maxsize=CACHE_SIZE)
+def status_pie_png(histogram):
+    fig = Figure()
+    ax = fig.subplots()
+    colors = [status_colors[label] for label in status_options]
+    ax.pie(histogram, labels=status_options, colors=colors, autopct='%1.1f%%', startangle=140)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    ax.set_title("Status de Implementación SGSI")  # Título del gráfico
+    return _to_png(fig)
+
+
+# Barras apiladas por familia de cláusulas: tupla de (familia, histograma de status)
+@lru_cache(maxsize=CACHE_SIZE)
+def family_bars_png(family_histograms):
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    labels = [family for family, _ in family_histograms]
+    bottom = [0] * len(labels)
+    for offset, status in enumerate(status_options):
+        sizes = [histogram[offset] for _, histogram in family_histograms]
+        ax.bar(labels, sizes, bottom=bottom, color=status_colors[status], label=status)
+        bottom = [base + size for base, size in zip(bottom, sizes)]
+    ax.set_title("Status por familia de cláusulas")
+    ax.legend(fontsize="small", bbox_to_anchor=(1, 1), loc="upper left")
+    fig.subplots_adjust(right=0.78)
+    return _to_png(fig)
+
+
+# Mapa de calor de madurez promedio (filas x columnas); values es una tupla de tuplas
+@lru_cache(maxsize=CACHE_SIZE)
+def heatmap_png(row_labels, column_labels, values, max_value):
+    fig = Figure(figsize=(8, max(2, 0.35 * len(row_labels) + 1)))
+    ax = fig.subplots()
+    image = ax.imshow(values, cmap="RdYlGn", vmin=0, vmax=max_value, aspect="auto")
+    ax.set_xticks(range(len(column_labels)), column_labels)
+    ax.set_yticks(range(len(row_labels)), row_labels)
+    ax.set_title("Madurez promedio por familia de cláusulas")
+    fig.colorbar(image, ax=ax)
+    return _to_png(fig)
@@ -0,0 +1,116 @@
+import warnings
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+import persistence
+from catalog import catalog, status_options
+
+# Status excluido de la escala ordinal (queda enmascarado como NaN)
+NOT_APPLICABLE = "No Aplica"
+# Nivel de madurez de cada status: su posición en status_options
+MATURITY = {status: float(level) for level, status in enumerate(status_options) if status != NOT_APPLICABLE}
+MAX_MATURITY = max(MATURITY.values())
+
+# Código/texto de control -> columna de la matriz
+_COLUMNS = {control.code: control.slot for control in catalog.controls}
+_COLUMNS.update({control.text: control.slot for control in catalog.controls})
+# Código de status del almacén -> nivel de madurez (NaN para "No Aplica" y sin responder)
+_LEVELS = np.full(256, np.nan)
+for _code, _status in enumerate(status_options):
+    _LEVELS[_code] = MATURITY.get(_status, np.nan)
+# Matriz de pertenencia control x familia para agregar por familia
+FAMILIES = list(catalog.families)
+_MEMBERSHIP = (np.array([control.family for control in catalog.controls])[:, None] == np.array(FAMILIES)[None, :]).astype(float)
+
+
+# Evaluaciones guardadas con clave estable y con respuestas (las de la versión anterior
+# se incorporan con migrate.py)
+def load_documents(collection=None):
+    if collection is None:
+        collection = persistence.get_collection()
+    query = {**persistence.KEYED, "responses.0": {"$exists": True}}
+    return list(collection.find(query, {"user_info": 1, "responses": 1, "updated_at": 1}))
+
+
+# Matriz evaluaciones x controles del catálogo con niveles de madurez (NaN = "No Aplica" o sin responder)
+def build_matrix(documents):
+    documents = [document for document in documents if document.get("responses")]
+    labels = pd.DataFrame(list(map(itemgetter("user_info"), documents)), columns=["name", "company"])
+    labels["updated_at"] = [document.get("updated_at") for document in documents]
+    matrix = np.full((len(documents), len(catalog)), np.nan)
+    if not documents:
+        return labels, matrix
+
+    # Una fila por respuesta: (evaluación, control, status)
+    responses = list(map(itemgetter("responses"), documents))
+    lengths = np.fromiter(map(len, responses), dtype=np.intp, count=len(responses))
+    flat = pd.DataFrame(list(chain.from_iterable(responses)), columns=["control", "status"])
+    rows = np.repeat(np.arange(len(documents)), lengths)
+    columns = flat["control"].map(_COLUMNS).to_numpy(dtype=float)
+    levels = flat["status"].map(MATURITY).to_numpy(dtype=float)
+    valid = ~np.isnan(columns)
+    matrix[rows[valid], columns[valid].astype(np.intp)] = levels[valid]
+    return labels, matrix
+
+
+# Fila de madurez de una evaluación en memoria (AnswerStore)
+def store_row(answers):
+    return _LEVELS[np.frombuffer(answers.status_codes(), dtype=np.uint8)]
+
+
+# Mediana del portafolio por control
+def portfolio_median(matrix):
+    # Los controles que nadie respondió quedan en NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmedian(matrix, axis=0)
+
+
+# Diferencia contra una referencia (positiva = la evaluación está por encima)
+def deltas(row, reference):
+    return row - reference
+
+
+# Brecha hasta el máximo nivel de madurez
+def gaps(row):
+    return MAX_MATURITY - row
+
+
+# Percentil de la evaluación en cada control: fracción del portafolio con igual o menor madurez
+def percentile_ranks(matrix, row):
+    answered = (~np.isnan(matrix)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ranks = (matrix <= row).sum(axis=0) / answered
+    return np.where(np.isnan(row) | (answered == 0), np.nan, ranks)
+
+
+# Madurez promedio por familia de cláusulas para cada fila de la matriz (filas x familias)
+def family_means(matrix):
+    matrix = np.atleast_2d(matrix)
+    present = ~np.isnan(matrix)
+    totals = np.where(present, matrix, 0) @ _MEMBERSHIP
+    counts = present.astype(float) @ _MEMBERSHIP
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return totals / counts
+
+
+# Madurez promedio por empresa y familia (para el mapa de calor)
+def company_heatmap(labels, matrix):
+    means = pd.DataFrame(family_means(matrix), columns=FAMILIES)
+    return means.groupby(labels["company"].to_numpy()).mean()
+
+
+# Tabla por control comparando una evaluación con una referencia
+def comparison_table(matrix, row, reference):
+    return pd.DataFrame({
+        "control": [control.code for control in catalog.controls],
+        "titulo": [control.text for control in catalog.controls],
+        "evaluación": row,
+        "referencia": reference,
+        "delta": deltas(row, reference),
+        "brecha": gaps(row),
+        "percentil": percentile_ranks(matrix, row)
+    })
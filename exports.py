@@ -0,0 +1,128 @@
+import argparse
+import csv
+import io
+import re
+import time
+
+import persistence
+from catalog import catalog
+
+ASSESSMENT_COLUMNS = ["control", "titulo", "status"]
+COMPANY_COLUMNS = ["nombre", "empresa", "control", "titulo", "status"]
+
+# Filas por lote al escribir Parquet
+PARQUET_BATCH_SIZE = 50000
+
+
+# Filas (código, título, status) de una evaluación, expandiendo el texto recién aquí
+def assessment_rows(answers):
+    for code, status in answers.items():
+        yield code, catalog.title(code), status
+
+
+# Filas de todas las evaluaciones guardadas de una empresa, leídas del cursor por lotes
+def company_rows(company, collection=None):
+    if collection is None:
+        collection = persistence.get_collection()
+    cursor = collection.find(
+        {"user_info.company": company},
+        {"user_info": 1, "responses": 1, "_id": 0},
+        batch_size=500
+    )
+    for document in cursor:
+        name = document["user_info"]["name"]
+        for response in document.get("responses", []):
+            # Las evaluaciones anteriores guardaban el texto completo del control
+            control = catalog.find(response["control"])
+            code, title = (control.code, control.text) if control else (response["control"], "")
+            yield name, company, code, title, response["status"]
+
+
+# XLSX en modo de memoria constante: las filas se escriben a disco a medida que llegan
+def write_xlsx(columns, rows, output):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("respuestas")
+    worksheet.write_row(0, 0, columns)
+    for index, row in enumerate(rows, start=1):
+        worksheet.write_row(index, 0, row)
+    workbook.close()
+
+
+def write_csv(columns, rows, output):
+    text = io.TextIOWrapper(output, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+# Parquet escrito por lotes para no acumular todas las filas en memoria
+def write_parquet(columns, rows, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    with pq.ParquetWriter(output, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_arrays(list(map(pa.array, zip(*batch))), schema=schema))
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_arrays(list(map(pa.array, zip(*batch))), schema=schema))
+
+
+# Formato -> (escritor, tipo MIME)
+FORMATS = {
+    "xlsx": (write_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (write_csv, "text/csv"),
+    "parquet": (write_parquet, "application/vnd.apache.parquet"),
+}
+
+
+# Exportar filas a bytes en memoria (para st.download_button)
+def to_bytes(export_format, columns, rows):
+    writer, _ = FORMATS[export_format]
+    output = io.BytesIO()
+    writer(columns, rows, output)
+    return output.getvalue()
+
+
+def assessment_bytes(answers, export_format):
+    return to_bytes(export_format, ASSESSMENT_COLUMNS, assessment_rows(answers))
+
+
+def company_bytes(company, export_format):
+    return to_bytes(export_format, COMPANY_COLUMNS, company_rows(company))
+
+
+def mime_type(export_format):
+    return FORMATS[export_format][1]
+
+
+# Nombre de archivo seguro para una exportación
+def export_filename(name, export_format):
+    return re.sub(r"[^\w.-]+", "_", f"{name}_respuestas_sgsi") + f".{export_format}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar todas las evaluaciones guardadas de una empresa")
+    parser.add_argument("company")
+    parser.add_argument("--format", choices=list(FORMATS), default="xlsx")
+    parser.add_argument("--out", help="archivo de salida (por defecto, <empresa>_respuestas_sgsi.<formato>)")
+    args = parser.parse_args()
+
+    out = args.out or export_filename(args.company, args.format)
+    writer, _ = FORMATS[args.format]
+    start = time.perf_counter()
+    with open(out, "wb") as output:
+        writer(COMPANY_COLUMNS, company_rows(args.company), output)
+    print(f"Evaluaciones de {args.company} exportadas en {out} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
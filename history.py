@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import persistence
+from catalog import catalog, status_options
+
+# Series de tendencia en memoria (evaluaciones más recientes)
+TREND_CACHE_SIZE = 256
+
+FAMILIES = list(catalog.families)
+_FAMILY_INDEX = {control.code: FAMILIES.index(control.family) for control in catalog.controls}
+_STATUS_INDEX = {status: index for index, status in enumerate(status_options)}
+
+# evaluación -> {"seq", "times", "counts"}; counts es una lista de matrices familias x status
+_trends = OrderedDict()
+_trends_lock = threading.Lock()
+
+
+def _collection(collection):
+    if collection is None:
+        collection = persistence.get_history_collection()
+    return persistence.ensure_indexes(collection, persistence.HISTORY_INDEX, unique=True)
+
+
+# Último checkpoint de una evaluación (hasta la fecha indicada)
+def _checkpoint(collection, key, at=None):
+    query = {"assessment": key, "kind": persistence.CHECKPOINT}
+    if at is not None:
+        query["at"] = {"$lte": at}
+    return next(iter(collection.find(query).sort("seq", -1).limit(1)), None)
+
+
+# Entradas de cambios posteriores a seq, en orden
+def _deltas(collection, key, seq, at=None):
+    query = {"assessment": key, "kind": persistence.DELTA, "seq": {"$gt": seq}}
+    if at is not None:
+        query["at"] = {"$lte": at}
+    return collection.find(query).sort("seq", 1)
+
+
+# Estado (código -> status) de una evaluación en una fecha: último checkpoint + cambios posteriores
+def snapshot_at(key, at=None, collection=None):
+    collection = _collection(collection)
+    checkpoint = _checkpoint(collection, key, at)
+    state = {response["control"]: response["status"] for response in checkpoint["responses"]} if checkpoint else {}
+    for entry in _deltas(collection, key, checkpoint["seq"] if checkpoint else 0, at):
+        for change in entry["changes"]:
+            if change["new"] is None:
+                state.pop(change["control"], None)
+            else:
+                state[change["control"]] = change["new"]
+    return state
+
+
+# Conteos familias x status de un estado
+def _family_counts(statuses):
+    counts = np.zeros((len(FAMILIES), len(status_options)), dtype=np.int32)
+    for control, status in statuses.items():
+        if control in _FAMILY_INDEX and status in _STATUS_INDEX:
+            counts[_FAMILY_INDEX[control], _STATUS_INDEX[status]] += 1
+    return counts
+
+
+# Serie de conteos por familia y status después de cada guardado. Se calcula de forma
+# incremental: cada cambio guarda el status anterior, así que basta con mover un conteo,
+# y solo se leen las entradas posteriores a la última serie calculada
+def family_trend(key, collection=None):
+    collection = _collection(collection)
+    with _trends_lock:
+        trend = _trends.get(key)
+        if trend is not None:
+            _trends.move_to_end(key)
+            trend = {"seq": trend["seq"], "times": list(trend["times"]), "counts": list(trend["counts"])}
+    if trend is None:
+        # Punto de partida: el estado base anterior al primer cambio registrado
+        base = next(iter(collection.find({"assessment": key, "kind": persistence.CHECKPOINT, "seq": 0}).limit(1)), None)
+        statuses = {response["control"]: response["status"] for response in base["responses"]} if base else {}
+        trend = {"seq": 0, "times": [base["at"]] if base else [], "counts": [_family_counts(statuses)] if base else []}
+
+    counts = trend["counts"][-1] if trend["counts"] else _family_counts({})
+    for entry in _deltas(collection, key, trend["seq"]):
+        counts = counts.copy()
+        for change in entry["changes"]:
+            family = _FAMILY_INDEX.get(change["control"])
+            if family is None:
+                continue
+            if change["old"] in _STATUS_INDEX:
+                counts[family, _STATUS_INDEX[change["old"]]] -= 1
+            if change["new"] in _STATUS_INDEX:
+                counts[family, _STATUS_INDEX[change["new"]]] += 1
+        trend["seq"] = entry["seq"]
+        trend["times"].append(entry["at"])
+        trend["counts"].append(counts)
+
+    with _trends_lock:
+        _trends[key] = trend
+        _trends.move_to_end(key)
+        while len(_trends) > TREND_CACHE_SIZE:
+            _trends.popitem(last=False)
+    return trend["times"], np.array(trend["counts"]).reshape(-1, len(FAMILIES), len(status_options))
+
+
+# Tabla fecha x status para el gráfico de tendencia (todas las familias o una sola)
+def trend_frame(key, family=None, collection=None):
+    times, counts = family_trend(key, collection)
+    counts = counts[:, FAMILIES.index(family)] if family else counts.sum(axis=1)
+    return pd.DataFrame(counts, index=pd.DatetimeIndex(times, name="fecha"), columns=status_options)
@@ -0,0 +1,140 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import persistence
+from catalog import catalog, status_options
+
+# Archivos generados por la versión anterior de la aplicación: "{nombre}_respuestas_sgsi.xlsx"
+SUFFIX = "_respuestas_sgsi.xlsx"
+
+
+# Leer un libro (ruta o archivo abierto) con columnas control/status y normalizar los
+# controles a códigos del catálogo: ({código: status}, filas, filas sin control/status válido)
+def read_workbook(source):
+    from openpyxl import load_workbook
+
+    responses = {}
+    rows = unknown = 0
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        values = sheet.iter_rows(values_only=True)
+        header = [str(value).strip().lower() if value is not None else "" for value in next(values, ())]
+        if "control" in header and "status" in header:
+            control_column = header.index("control")
+            status_column = header.index("status")
+            for row in values:
+                rows += 1
+                control = catalog.find(str(row[control_column] or ""))
+                status = row[status_column]
+                if control is None or status not in status_options:
+                    unknown += 1
+                    continue
+                responses[control.code] = status
+    finally:
+        workbook.close()
+    return responses, rows, unknown
+
+
+# Leer un archivo del directorio (se ejecuta en un proceso del pool)
+def parse_workbook(path):
+    responses, rows, unknown = read_workbook(path)
+    return {
+        "path": path,
+        "name": os.path.basename(path)[:-len(SUFFIX)],
+        "modified": datetime.fromtimestamp(os.path.getmtime(path), timezone.utc),
+        "responses": [{"control": code, "status": status} for code, status in responses.items()],
+        "rows": rows,
+        "unknown": unknown
+    }
+
+
+# Cargar un lote con upserts sin orden; las evaluaciones ya guardadas se conservan salvo overwrite.
+# Devuelve (nuevas, actualizadas)
+def _write_batch(collection, batch, overwrite):
+    from pymongo import UpdateOne
+
+    operations = []
+    for key, parsed in batch.items():
+        document = {
+            "user_info": parsed["user_info"],
+            "responses": parsed["responses"],
+            "updated_at": parsed["modified"],
+            "source": os.path.basename(parsed["path"])
+        }
+        operations.append(UpdateOne({"_id": key}, {"$setOnInsert": document}, upsert=True))
+    result = collection.bulk_write(operations, ordered=False)
+    updated = 0
+    if overwrite:
+        # Las evaluaciones que ya existían se reemplazan con save_changes para que el cambio
+        # quede en el historial y la versión (history_seq) siga siendo consistente
+        inserted = set(result.upserted_ids)
+        for index, parsed in enumerate(batch.values()):
+            if index not in inserted:
+                changes = {response["control"]: response["status"] for response in parsed["responses"]}
+                if persistence.save_changes(parsed["user_info"], changes, collection=collection, replace=True):
+                    updated += 1
+    return result.upserted_count, updated
+
+
+# Importar todos los libros de un directorio en paralelo
+def import_directory(directory, company, workers=None, batch_size=500, overwrite=False, collection=None, progress=print):
+    if collection is None:
+        collection = persistence.get_collection()
+    paths = sorted(glob.glob(os.path.join(directory, "*" + SUFFIX)))
+    stats = {"files": 0, "rows": 0, "unknown": 0, "empty": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    batch = {}
+    start = time.perf_counter()
+
+    def flush():
+        inserted, updated = _write_batch(collection, batch, overwrite)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        stats["skipped"] += len(batch) - inserted - updated
+        batch.clear()
+        elapsed = time.perf_counter() - start
+        progress(f"[{stats['files']}/{len(paths)}] {stats['rows']} filas, {stats['rows'] / elapsed:.0f} filas/s")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for parsed in executor.map(parse_workbook, paths, chunksize=8):
+            stats["files"] += 1
+            stats["rows"] += parsed["rows"]
+            stats["unknown"] += parsed["unknown"]
+            if not parsed["responses"]:
+                stats["empty"] += 1
+                continue
+            parsed["user_info"] = {"name": parsed["name"], "company": company}
+            # Varios archivos de la misma persona: se queda el último
+            batch[persistence.assessment_key(parsed["user_info"])] = parsed
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar archivos *_respuestas_sgsi.xlsx a MongoDB")
+    parser.add_argument("directory")
+    parser.add_argument("--company", required=True, help="empresa a la que pertenecen las evaluaciones")
+    parser.add_argument("--workers", type=int, help="cantidad de procesos (por defecto, uno por CPU)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--overwrite", action="store_true", help="reemplazar evaluaciones ya guardadas")
+    args = parser.parse_args()
+
+    stats = import_directory(args.directory, args.company, args.workers, args.batch_size, args.overwrite)
+    print(
+        f"{stats['files']} archivos, {stats['rows']} filas ({stats['unknown']} sin control/status válido) en "
+        f"{stats['seconds']:.1f}s ({stats['rows'] / max(stats['seconds'], 1e-9):.0f} filas/s): "
+        f"{stats['inserted']} nuevas, {stats['updated']} actualizadas, {stats['skipped']} ya existentes, "
+        f"{stats['empty']} sin respuestas"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import functools
+import io
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas en formato Prometheus: servidor HTTP local en METRICS_PORT (/metrics)
+# y/o archivo de texto para el textfile collector de node_exporter en METRICS_TEXTFILE
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+ENABLED = bool(METRICS_PORT or METRICS_TEXTFILE)
+# Segundos mínimos entre escrituras del archivo de métricas
+TEXTFILE_INTERVAL = 15.0
+# Una sesión cuenta como activa si tuvo un rerun en esta ventana de segundos
+ACTIVE_SESSION_WINDOW = 300.0
+# Token para activar el perfilado de una sesión con ?perfil=<token>; sin token no se puede activar
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+# Límites superiores (segundos) de los buckets de los histogramas de duración
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Escrituras del archivo de métricas (separado de _lock: render() lo toma)
+_textfile_lock = threading.Lock()
+# nombre -> {"count", "sum", "buckets"}
+_durations = {}
+# comando -> cantidad
+_mongo_commands = {}
+_mongo_bytes_written = 0
+# session_id -> (último rerun, bytes de session_state) de las sesiones activas
+_sessions = {}
+_server_started = False
+_textfile_written = 0.0
+# Medición de rerun en curso en el hilo (un fragmento dentro del rerun completo no se mide aparte)
+_active = threading.local()
+# Prefijo de las duraciones de reruns en _durations; el resto del nombre es el tipo (script o fragment)
+_RERUN_PREFIX = "rerun:"
+
+
+def _observe(name, seconds):
+    with _lock:
+        stats = _durations.get(name)
+        if stats is None:
+            stats = _durations[name] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)}
+        stats["count"] += 1
+        stats["sum"] += seconds
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][index] += 1
+
+
+# Medir un bloque de código
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(name, time.perf_counter() - start)
+
+
+# Decorador que mide cada llamada de una función (las llamadas se acumulan por nombre)
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Listeners de pymongo que cuentan viajes a MongoDB por comando y bytes escritos
+def mongo_listeners():
+    import bson
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        def started(self, event):
+            global _mongo_bytes_written
+            written = len(bson.encode(event.command)) if event.command_name in ("insert", "update", "delete", "findAndModify") else 0
+            with _lock:
+                _mongo_commands[event.command_name] = _mongo_commands.get(event.command_name, 0) + 1
+                _mongo_bytes_written += written
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    return [CommandCounter()] if ENABLED else []
+
+
+# Bytes aproximados de session_state: serializados, o el tamaño que informa el objeto
+# si no se puede serializar (p. ej. AnswerStore, que comparte el catálogo)
+def _session_state_size(session_state):
+    size = 0
+    for value in session_state.to_dict().values():
+        try:
+            size += len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            size += sys.getsizeof(value)
+    return size
+
+
+# ¿El token recibido activa el perfilado?
+def valid_profile_token(token):
+    return bool(PROFILE_TOKEN) and token == PROFILE_TOKEN
+
+
+# Medición de un rerun del script o de un fragmento (kind); con profile=True se perfila con
+# cProfile y tracemalloc. Una medición iniciada dentro de otra del mismo hilo no hace nada
+class Rerun:
+    def __init__(self, profile=False, kind="script"):
+        self._start = time.perf_counter()
+        self._kind = kind
+        self._profiler = None
+        self._tracing = False
+        self._nested = getattr(_active, "rerun", None) is not None
+        if self._nested:
+            return
+        _active.rerun = self
+        if profile:
+            import cProfile
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Otro perfilador activo en este hilo
+                self._profiler = None
+
+    # Registrar el rerun y devolver el reporte de perfilado (o None); el perfilado
+    # se detiene aunque falle el registro
+    def finish(self, session_id, session_state):
+        if self._nested:
+            return None
+        _active.rerun = None
+        try:
+            _observe(_RERUN_PREFIX + self._kind, time.perf_counter() - self._start)
+            if ENABLED and session_id is not None:
+                size = _session_state_size(session_state)
+                with _lock:
+                    _sessions[session_id] = (time.monotonic(), size)
+                _export()
+        except Exception:
+            # La medición nunca interrumpe la página
+            logger.exception("No se pudo registrar el rerun")
+        finally:
+            report = self._report()
+        return report
+
+    def _report(self):
+        if self._profiler is None and not self._tracing:
+            return None
+        import pstats
+        import tracemalloc
+
+        output = io.StringIO()
+        try:
+            if self._profiler is not None:
+                self._profiler.disable()
+                pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(25)
+            if tracemalloc.is_tracing():
+                output.write("Memoria asignada por línea (top 10):\n")
+                for stat in tracemalloc.take_snapshot().statistics("lineno")[:10]:
+                    output.write(f"{stat}\n")
+        finally:
+            if self._tracing:
+                tracemalloc.stop()
+        return output.getvalue()
+
+
+def start_rerun(profile=False, kind="script"):
+    return Rerun(profile, kind)
+
+
+def _labels(**pairs):
+    text = ",".join(f'{name}="{value}"' for name, value in pairs.items())
+    return f"{{{text}}}" if text else ""
+
+
+# Texto en formato de exposición de Prometheus
+def render():
+    now = time.monotonic()
+    lines = []
+    with _lock:
+        for metric, rerun in (("sgsi_rerun_seconds", True), ("sgsi_function_seconds", False)):
+            lines.append(f"# TYPE {metric} histogram")
+            for name, stats in sorted(_durations.items()):
+                if name.startswith(_RERUN_PREFIX) != rerun:
+                    continue
+                labels = {"kind": name[len(_RERUN_PREFIX):]} if rerun else {"function": name}
+                for bound, count in zip(BUCKETS, stats["buckets"]):
+                    lines.append(f"{metric}_bucket{_labels(**labels, le=bound)} {count}")
+                lines.append(f"{metric}_bucket{_labels(**labels, le='+Inf')} {stats['count']}")
+                lines.append(f"{metric}_sum{_labels(**labels)} {stats['sum']}")
+                lines.append(f"{metric}_count{_labels(**labels)} {stats['count']}")
+        lines.append("# TYPE sgsi_mongo_commands_total counter")
+        for command, count in sorted(_mongo_commands.items()):
+            lines.append(f"sgsi_mongo_commands_total{_labels(command=command)} {count}")
+        lines.append("# TYPE sgsi_mongo_bytes_written_total counter")
+        lines.append(f"sgsi_mongo_bytes_written_total {_mongo_bytes_written}")
+        # Descartar las sesiones inactivas
+        for session_id in [session_id for session_id, (seen, _) in _sessions.items() if now - seen > ACTIVE_SESSION_WINDOW]:
+            del _sessions[session_id]
+        sizes = [size for _, size in _sessions.values()]
+        lines.append("# TYPE sgsi_active_sessions gauge")
+        lines.append(f"sgsi_active_sessions {len(sizes)}")
+        lines.append("# TYPE sgsi_session_state_bytes gauge")
+        lines.append(f"sgsi_session_state_bytes{_labels(stat='sum')} {sum(sizes)}")
+        lines.append(f"sgsi_session_state_bytes{_labels(stat='max')} {max(sizes, default=0)}")
+    return "\n".join(lines) + "\n"
+
+
+# Publicar las métricas según la configuración (servidor HTTP una sola vez, archivo cada
+# TEXTFILE_INTERVAL). Un error al publicar se registra y nunca interrumpe el rerun
+def _export():
+    global _server_started, _textfile_written
+    if METRICS_PORT and not _server_started:
+        with _lock:
+            start = not _server_started
+            _server_started = True
+        if start:
+            try:
+                _start_server(int(METRICS_PORT))
+            except Exception:
+                logger.exception("No se pudo iniciar el servidor de métricas en el puerto %s", METRICS_PORT)
+    # Si otro hilo está escribiendo el archivo, este rerun no espera
+    if METRICS_TEXTFILE and _textfile_lock.acquire(blocking=False):
+        try:
+            if time.monotonic() - _textfile_written >= TEXTFILE_INTERVAL:
+                _textfile_written = time.monotonic()
+                # Escritura atómica para que el collector nunca lea un archivo a medias
+                temporary = f"{METRICS_TEXTFILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temporary, "w") as output:
+                    output.write(render())
+                os.replace(temporary, METRICS_TEXTFILE)
+        except Exception:
+            logger.exception("No se pudo escribir el archivo de métricas %s", METRICS_TEXTFILE)
+        finally:
+            _textfile_lock.release()
+
+
+def _start_server(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
@@ -0,0 +1,60 @@
+import argparse
+
+import persistence
+from catalog import catalog
+
+
+# Status por código de control de una evaluación anterior (texto completo del control);
+# los controles que no están en el catálogo se descartan
+def legacy_statuses(document):
+    statuses = {}
+    for response in document.get("responses") or []:
+        control = catalog.find(response.get("control", ""))
+        if control and response.get("status"):
+            statuses[control.code] = response["status"]
+    return statuses
+
+
+# Incorporar las evaluaciones de la versión anterior a los documentos con clave estable:
+# de cada persona se conserva el último documento insertado (los _id generados crecen con
+# la fecha), con los controles como códigos, y se eliminan todos sus duplicados. Si la
+# persona ya tiene un documento con clave (retomado o importado después), se conserva ese.
+def migrate_legacy(collection=None):
+    if collection is None:
+        collection = persistence.get_collection()
+    stats = {"legacy": 0, "migrated": 0, "kept": 0, "invalid": 0}
+    latest = {}
+    legacy_ids = []
+    for document in collection.find(persistence.LEGACY, {"user_info": 1, "responses": 1}).sort("_id", 1):
+        stats["legacy"] += 1
+        user_info = document.get("user_info") or {}
+        if not user_info.get("name") or not user_info.get("company"):
+            stats["invalid"] += 1
+            continue
+        legacy_ids.append(document["_id"])
+        latest[persistence.assessment_key(user_info)] = document
+
+    keyed = {document["_id"] for document in collection.find({"_id": {"$in": list(latest)}}, {"_id": 1})}
+    for key, document in latest.items():
+        if key in keyed:
+            stats["kept"] += 1
+            continue
+        user_info = {"name": document["user_info"]["name"], "company": document["user_info"]["company"]}
+        persistence.save_changes(user_info, legacy_statuses(document), collection=collection, replace=True)
+        stats["migrated"] += 1
+    if legacy_ids:
+        collection.delete_many({"_id": {"$in": legacy_ids}})
+    return stats
+
+
+def main():
+    argparse.ArgumentParser(description="Migrar las evaluaciones de la versión anterior a documentos con clave estable").parse_args()
+    stats = migrate_legacy()
+    print(
+        f"{stats['legacy']} documentos anteriores: {stats['migrated']} evaluaciones migradas, "
+        f"{stats['kept']} ya tenían documento con clave, {stats['invalid']} sin nombre o empresa (se conservan)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import instrumentation
+
+from catalog import catalog
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+
+# Cliente de MongoDB compartido por todas las sesiones del proceso.
+# Streamlit vuelve a ejecutar app.py en cada interacción, pero este módulo
+# se importa una sola vez, así que el pool de conexiones se reutiliza.
+_client = None
+_client_lock = threading.Lock()
+
+# Historial de cambios: una entrada por guardado con los cambios (old -> new) y un
+# checkpoint con el estado completo cada HISTORY_CHECKPOINT_INTERVAL entradas
+HISTORY_COLLECTION = "historial"
+HISTORY_CHECKPOINT_INTERVAL = int(os.getenv("HISTORY_CHECKPOINT_INTERVAL", "20"))
+DELTA = "delta"
+CHECKPOINT = "checkpoint"
+HISTORY_INDEX = [("assessment", 1), ("kind", 1), ("seq", 1)]
+
+# Funciones a llamar con la clave de cada evaluación guardada (p. ej. para invalidar cachés)
+_save_listeners = []
+
+# Contador de guardados del proceso; permite invalidar consultas en caché cuando llegan datos nuevos
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+# Función para obtener (y crear la primera vez) el cliente de MongoDB
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                mongo_uri = os.getenv("MONGODB_URI")
+                if mongo_uri and mongo_uri.startswith("mongomock://"):
+                    # Sustituto en memoria para pruebas y benchmarks
+                    import mongomock
+                    _client = mongomock.MongoClient()
+                else:
+                    from pymongo import MongoClient
+                    _client = MongoClient(
+                        mongo_uri,
+                        maxPoolSize=int(os.getenv("MONGODB_POOL_SIZE", "50")),
+                        event_listeners=instrumentation.mongo_listeners()
+                    )
+    return _client
+
+
+# Función para obtener la colección de respuestas
+def get_collection():
+    return get_client()["sgsi_db"]["respuestas"]
+
+
+# Colección del historial en la misma base que la colección de respuestas; el índice
+# único impide dos entradas con el mismo seq para una evaluación
+def get_history_collection(collection=None):
+    if collection is None:
+        collection = get_collection()
+    return ensure_indexes(collection.database[HISTORY_COLLECTION], HISTORY_INDEX, unique=True)
+
+
+# Índices ya creados en este proceso: (base, colección, especificación)
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+# Crear (una vez por proceso) los índices de una colección; cada especificación es un
+# campo o una lista de (campo, orden) y las opciones (p. ej. unique=True) valen para todas
+def ensure_indexes(collection, *specs, **options):
+    for spec in specs:
+        key = (collection.database.name, collection.name, repr(spec), repr(sorted(options.items())))
+        if key in _indexed:
+            continue
+        with _indexed_lock:
+            if key not in _indexed:
+                collection.create_index(spec, **options)
+                _indexed.add(key)
+    return collection
+
+
+# Generación actual de los datos guardados
+def generation():
+    return _generation
+
+
+def _bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+# Registrar una función que se llama con la clave de cada evaluación guardada
+def on_save(listener):
+    _save_listeners.append(listener)
+    return listener
+
+
+# Evaluaciones con clave estable (_id "empresa::nombre") y las guardadas por la versión anterior,
+# que insertaba un documento con _id generado por cada clic en "Guardar" y el texto completo de cada control
+KEYED = {"_id": {"$type": "string"}}
+LEGACY = {"_id": {"$not": {"$type": "string"}}}
+
+
+# Clave estable de una evaluación: usuario + empresa
+def assessment_key(user_info):
+    return f"{user_info['company'].strip().lower()}::{user_info['name'].strip().lower()}"
+
+
+# Status guardados de una evaluación por código de control
+# (las evaluaciones anteriores guardaban el texto completo del control)
+def _stored_statuses(document):
+    statuses = {}
+    for response in document.get("responses", []):
+        control = catalog.find(response["control"])
+        statuses[control.code if control else response["control"]] = response["status"]
+    return statuses
+
+
+def _snapshot(statuses):
+    return [{"control": control, "status": status} for control, status in statuses.items()]
+
+
+# Entradas del historial de un guardado: los cambios (old -> new), el estado anterior a la
+# primera entrada como checkpoint base (seq 0) y un checkpoint completo cada HISTORY_CHECKPOINT_INTERVAL
+def _history_entries(key, seq, now, document, previous, state, deltas):
+    entries = []
+    if seq == 1 and previous:
+        entries.append({"assessment": key, "kind": CHECKPOINT, "seq": 0, "at": document.get("updated_at") or now, "responses": _snapshot(previous)})
+    entries.append({"assessment": key, "kind": DELTA, "seq": seq, "at": now, "changes": deltas})
+    if seq % HISTORY_CHECKPOINT_INTERVAL == 0:
+        entries.append({"assessment": key, "kind": CHECKPOINT, "seq": seq, "at": now, "responses": _snapshot(state)})
+    return entries
+
+
+# Copiar al historial las entradas pendientes de un guardado ya confirmado. Es idempotente
+# (upsert por evaluación, tipo y seq), así que se puede repetir si falló a mitad de camino
+def _flush_history(collection, history, key, seq, entries):
+    from pymongo import UpdateOne
+
+    history.bulk_write([
+        UpdateOne({"assessment": entry["assessment"], "kind": entry["kind"], "seq": entry["seq"]}, {"$setOnInsert": entry}, upsert=True)
+        for entry in entries
+    ], ordered=True)
+    collection.update_one({"_id": key, "history_seq": seq}, {"$unset": {"history_pending": ""}})
+
+
+# Otro guardado de la misma evaluación se confirmó primero (p. ej. desde otra pestaña);
+# el autoguardado reintenta y vuelve a calcular los cambios sobre el estado nuevo
+class SaveConflict(Exception):
+    pass
+
+
+# Función para guardar los status modificados de una evaluación; con replace=True los
+# controles que no están en changes se eliminan. Devuelve la cantidad de controles que cambiaron.
+# Las respuestas, el número de versión (history_seq) y las entradas de historial pendientes se
+# escriben en una sola actualización atómica, condicionada a la versión leída; las entradas se
+# copian después al historial y, si eso falla, el siguiente guardado las completa.
+def save_changes(user_info, changes, collection=None, replace=False):
+    from pymongo.errors import DuplicateKeyError
+
+    if collection is None:
+        collection = get_collection()
+    history = get_history_collection(collection)
+    key = assessment_key(user_info)
+    now = datetime.now(timezone.utc)
+    document = collection.find_one({"_id": key}, {"responses": 1, "updated_at": 1, "history_seq": 1, "history_pending": 1}) or {}
+    version = document.get("history_seq", 0)
+    if document.get("history_pending"):
+        _flush_history(collection, history, key, version, document["history_pending"])
+
+    # Estado guardado, para registrar solo los controles que cambian de status
+    previous = _stored_statuses(document)
+    state = {} if replace else dict(previous)
+    state.update(changes)
+    deltas = [
+        {"control": control, "old": previous.get(control), "new": state.get(control)}
+        for control in [*state, *(control for control in previous if control not in state)]
+        if previous.get(control) != state.get(control)
+    ]
+    seq = version + (1 if deltas else 0)
+    fields = {
+        "user_info": {"name": user_info["name"], "company": user_info["company"]},
+        "updated_at": now,
+        "history_seq": seq
+    }
+    entries = []
+    if deltas:
+        entries = _history_entries(key, seq, now, document, previous, state, deltas)
+        fields["responses"] = _snapshot(state)
+        fields["history_pending"] = entries
+    try:
+        # Si otro guardado cambió la versión, el upsert intenta insertar el mismo _id y falla
+        collection.update_one({"_id": key, "history_seq": version or {"$in": [None, 0]}}, {"$set": fields}, upsert=True)
+    except DuplicateKeyError:
+        raise SaveConflict(f"la evaluación {key} se guardó desde otra sesión") from None
+    if entries:
+        _flush_history(collection, history, key, seq, entries)
+    if not document:
+        # Primer guardado con clave: los documentos de la versión anterior de la misma persona
+        # ya se retomaron (o quedaron reemplazados) y no deben contarse dos veces
+        collection.delete_many({**LEGACY, "user_info.company": user_info["company"], "user_info.name": user_info["name"]})
+    _bump_generation()
+    for listener in _save_listeners:
+        listener(key)
+    return len(deltas)
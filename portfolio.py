@@ -0,0 +1,106 @@
+import persistence
+from catalog import status_options
+
+# Status fuera de la escala de madurez
+NOT_APPLICABLE = "No Aplica"
+# Escala ordinal de madurez (índice en status_options, sin "No Aplica")
+MATURITY_SCALE = [status for status in status_options if status != NOT_APPLICABLE]
+
+# Expresión de agregación status -> nivel de madurez
+_MATURITY_EXPRESSION = {"$switch": {
+    "branches": [{"case": {"$eq": ["$responses.status", status]}, "then": level} for level, status in enumerate(MATURITY_SCALE)],
+    "default": None
+}}
+
+
+def _collection(collection):
+    if collection is None:
+        collection = persistence.get_collection()
+    # Índices que usan los pipelines
+    return persistence.ensure_indexes(
+        collection,
+        "user_info.company",
+        [("responses.control", 1), ("responses.status", 1)],
+        [("user_info.company", 1), ("responses.status", 1)]
+    )
+
+
+# Filtro inicial: solo evaluaciones con clave estable (las anteriores se incorporan con
+# migrate.py) y, opcionalmente, por empresas (usa el índice de user_info.company)
+def _match_companies(companies):
+    match = dict(persistence.KEYED)
+    if companies:
+        match["user_info.company"] = {"$in": list(companies)}
+    return [{"$match": match}]
+
+
+# Distribución de status por empresa: [{"company", "status", "count"}]
+def company_distribution(companies=None, collection=None):
+    pipeline = _match_companies(companies) + [
+        {"$unwind": "$responses"},
+        {"$group": {"_id": {"company": "$user_info.company", "status": "$responses.status"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "company": "$_id.company", "status": "$_id.status", "count": 1}},
+        {"$sort": {"company": 1, "status": 1}}
+    ]
+    return list(_collection(collection).aggregate(pipeline))
+
+
+# Distribución de status por control: [{"control", "status", "count"}]
+def control_distribution(companies=None, collection=None):
+    pipeline = _match_companies(companies) + [
+        {"$unwind": "$responses"},
+        {"$group": {"_id": {"control": "$responses.control", "status": "$responses.status"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "control": "$_id.control", "status": "$_id.status", "count": 1}},
+        {"$sort": {"control": 1, "status": 1}}
+    ]
+    return list(_collection(collection).aggregate(pipeline))
+
+
+# Controles con menor madurez promedio en el portafolio: [{"control", "maturity", "assessments"}]
+def weakest_controls(limit=10, companies=None, collection=None):
+    pipeline = _match_companies(companies) + [
+        {"$unwind": "$responses"},
+        {"$match": {"responses.status": {"$in": MATURITY_SCALE}}},
+        {"$group": {
+            "_id": "$responses.control",
+            "maturity": {"$avg": _MATURITY_EXPRESSION},
+            "assessments": {"$sum": 1}
+        }},
+        {"$sort": {"maturity": 1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "control": "$_id", "maturity": 1, "assessments": 1}}
+    ]
+    return list(_collection(collection).aggregate(pipeline))
+
+
+# Evaluaciones que cumplen los filtros, con el status del control elegido: [{"name", "company", "control", "status"}]
+def drill_down(company=None, control=None, status=None, limit=500, collection=None):
+    match = dict(persistence.KEYED)
+    if company:
+        match["user_info.company"] = company
+    response_match = {}
+    if control:
+        response_match["control"] = control
+    if status:
+        response_match["status"] = status
+    if response_match:
+        match["responses"] = {"$elemMatch": response_match}
+    pipeline = [
+        {"$match": match},
+        {"$unwind": "$responses"},
+        {"$match": {f"responses.{field}": value for field, value in response_match.items()}},
+        {"$project": {
+            "_id": 0,
+            "name": "$user_info.name",
+            "company": "$user_info.company",
+            "control": "$responses.control",
+            "status": "$responses.status"
+        }},
+        {"$limit": limit}
+    ]
+    return list(_collection(collection).aggregate(pipeline))
+
+
+# Empresas con evaluaciones guardadas
+def companies(collection=None):
+    return sorted(company for company in _collection(collection).distinct("user_info.company", persistence.KEYED) if company)
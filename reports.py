@@ -0,0 +1,234 @@
+import argparse
+import io
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from fpdf import FPDF
+
+import charts
+import persistence
+from catalog import catalog, status_options, status_meanings
+from store import AnswerStore
+
+REQUISITOS_COLUMN = "Proporción de Requisitos del SGSI"
+CONTROLES_COLUMN = "Proporción de Controles de Seguridad de la Información"
+
+
+# Datos de la tabla de métricas a partir de los contadores del almacén
+def metrics_data(answers):
+    counts_requisitos = answers.status_counts("requisitos")
+    counts_controles = answers.status_counts("controles")
+    total_requisitos = sum(counts_requisitos.values())
+    total_controles = sum(counts_controles.values())
+
+    metrics = {
+        "Status": status_options,
+        "Significado": [status_meanings[status] for status in status_options],
+        REQUISITOS_COLUMN: [],
+        CONTROLES_COLUMN: []
+    }
+    for status in status_options:
+        proportion_requisitos = (counts_requisitos[status] / total_requisitos) * 100 if total_requisitos else 0
+        proportion_controles = (counts_controles[status] / total_controles) * 100 if total_controles else 0
+        metrics[REQUISITOS_COLUMN].append(f"{proportion_requisitos:.1f}%")
+        metrics[CONTROLES_COLUMN].append(f"{proportion_controles:.1f}%")
+    return metrics
+
+
+# Ancho reservado al final de cada línea para el status (": Desconocido")
+STATUS_WIDTH = 32
+
+# Fuente Unicode (DejaVu Sans, incluida con matplotlib) para los reportes con textos fuera de
+# Latin-1, como "ACME – Sur", que las fuentes base del PDF no cubren. Cargarla cuesta más que
+# generar el reporte, así que solo se usa cuando hace falta
+FONT = "DejaVu"
+FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf", "I": "DejaVuSans-Oblique.ttf"}
+CORE_FONT = "Helvetica"
+
+_measure = {}
+_measure_lock = threading.Lock()
+
+
+def _latin1(text):
+    try:
+        text.encode("latin-1")
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+# ¿Los textos fijos del reporte (catálogo y status) caben en Latin-1?
+@lru_cache(maxsize=1)
+def _catalog_latin1():
+    texts = [section.title for section in catalog.sections]
+    for family in catalog.families.values():
+        texts.append(family.title)
+        texts.extend(group.title for group in family.groups if group.title)
+    texts.extend(control.text for control in catalog.controls)
+    texts.extend(status_options)
+    return all(_latin1(text) for text in texts)
+
+
+# Fuente de un reporte según sus textos
+def _font_for(user_info):
+    if _catalog_latin1() and _latin1(f"{user_info['name']}{user_info['company']}"):
+        return CORE_FONT
+    return FONT
+
+
+# Registrar la fuente Unicode en un PDF
+def _add_fonts(pdf):
+    import matplotlib
+
+    directory = os.path.join(matplotlib.get_data_path(), "fonts", "ttf")
+    for style, filename in FONT_FILES.items():
+        pdf.add_font(FONT, style, os.path.join(directory, filename))
+
+
+# Partir un texto en líneas una sola vez por proceso (los títulos del catálogo no cambian)
+@lru_cache(maxsize=4096)
+def _wrap(text, font, style, width):
+    with _measure_lock:
+        measure = _measure.get(font)
+        if measure is None:
+            measure = _measure[font] = FPDF()
+            if font == FONT:
+                _add_fonts(measure)
+            measure.add_page()
+        measure.set_font(font, style, 12)
+        return tuple(measure.multi_cell(width, 8, text, dry_run=True, output="LINES"))
+
+
+# PDF que solo cambia de fuente cuando cambia el estilo y reutiliza el corte de líneas
+class _ReportPDF(FPDF):
+    def __init__(self, font=CORE_FONT):
+        super().__init__()
+        if font == FONT:
+            _add_fonts(self)
+        self._font = font
+        self._style = None
+
+    def paragraph(self, text, style="", align="L", suffix=""):
+        if style != self._style:
+            self.set_font(self._font, style, 12)
+            self._style = style
+        lines = _wrap(text, self._font, style, self.epw - (STATUS_WIDTH if suffix else 0))
+        for line in lines[:-1]:
+            self.cell(0, 8, line, align=align, new_x="LMARGIN", new_y="NEXT")
+        self.cell(0, 8, lines[-1] + suffix, align=align, new_x="LMARGIN", new_y="NEXT")
+
+
+# Función para generar el PDF de una evaluación en tiempo lineal (chart: bytes PNG, por defecto el gráfico en caché)
+def generate_pdf(answers, user_info, chart=None):
+    pdf = _ReportPDF(_font_for(user_info))
+    pdf.add_page()
+
+    pdf.paragraph(f"Reporte SGSI - {user_info['company']}", align="C")
+    pdf.paragraph(f"Nombre: {user_info['name']}")
+    pdf.paragraph(f"Empresa: {user_info['company']}")
+
+    # Recorrer las secciones del catálogo (requisitos y controles del Anexo A)
+    for section in catalog.sections:
+        pdf.paragraph(section.title, "B")
+        for family in section.families:
+            pdf.paragraph(family.title, "B")
+            for group in family.groups:
+                if group.title:
+                    pdf.paragraph(group.title, "I")
+                for control in group.controls:
+                    pdf.paragraph(control.text, suffix=f": {answers.get(control.code, 'Desconocido')}")
+
+    # Agregar gráficos y tablas
+    pdf.add_page()
+    pdf.paragraph("Métricas", "B")
+    histogram = answers.status_histogram()
+    if chart is None and sum(histogram):
+        chart = charts.status_pie_png(histogram)
+    if chart:
+        pdf.image(io.BytesIO(chart), x=10, y=None, w=190)
+    metrics = metrics_data(answers)
+    for status, requisitos, controles in zip(metrics["Status"], metrics[REQUISITOS_COLUMN], metrics[CONTROLES_COLUMN]):
+        pdf.paragraph(f"{status}: {requisitos} de los requisitos, {controles} de los controles")
+
+    return bytes(pdf.output())
+
+
+# Nombre de archivo seguro para un reporte
+def report_filename(user_info):
+    return re.sub(r"[^\w.-]+", "_", f"{user_info['company']}_{user_info['name']}") + ".pdf"
+
+
+# Generar un reporte a partir de un documento guardado en MongoDB (se ejecuta en un proceso del pool).
+# Devuelve (ruta, None) o (identificador, error) para que un documento fallido no detenga el lote
+def _render_document(job):
+    document, path = job
+    try:
+        user_info = document["user_info"]
+        answers = AnswerStore.from_records(document.get("responses", []))
+        with open(path, "wb") as report_file:
+            report_file.write(generate_pdf(answers, user_info))
+        return path, None
+    except Exception as error:
+        return str(document.get("_id")), f"{type(error).__name__}: {error}"
+
+
+# Trabajos del pool con un archivo distinto por evaluación: dos nombres distintos pueden
+# dar el mismo nombre de archivo seguro, y ningún reporte debe pisar a otro
+def _jobs(documents, out_dir):
+    used = Counter()
+    for document in documents:
+        try:
+            filename = report_filename(document["user_info"])
+        except (KeyError, TypeError):
+            filename = re.sub(r"[^\w.-]+", "_", str(document.get("_id"))) + ".pdf"
+        used[filename] += 1
+        if used[filename] > 1:
+            root, extension = os.path.splitext(filename)
+            filename = f"{root}_{used[filename]}{extension}"
+        yield document, os.path.join(out_dir, filename)
+
+
+# Generar en paralelo los reportes de todas las evaluaciones guardadas con clave estable,
+# una por persona (opcionalmente de una empresa; las de la versión anterior se incorporan con
+# migrate.py). Devuelve las rutas generadas y los errores por documento (identificador, error)
+def generate_reports(out_dir, company=None, workers=None, collection=None):
+    if collection is None:
+        collection = persistence.get_collection()
+    os.makedirs(out_dir, exist_ok=True)
+    query = dict(persistence.KEYED)
+    if company:
+        query["user_info.company"] = company
+    documents = collection.find(query, {"user_info": 1, "responses": 1})
+    paths, errors = [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result, error in executor.map(_render_document, _jobs(documents, out_dir), chunksize=4):
+            if error:
+                errors.append((result, error))
+            else:
+                paths.append(result)
+    return paths, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar reportes PDF de las evaluaciones guardadas en MongoDB")
+    parser.add_argument("--out", default="reportes", help="directorio de salida")
+    parser.add_argument("--company", help="generar solo los reportes de esta empresa")
+    parser.add_argument("--workers", type=int, help="cantidad de procesos (por defecto, uno por CPU)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths, errors = generate_reports(args.out, args.company, args.workers)
+    print(f"{len(paths)} reportes generados en {args.out} ({time.perf_counter() - start:.1f}s)")
+    for document, error in errors:
+        print(f"error en la evaluación {document}: {error}")
+    if errors:
+        raise SystemExit(f"{len(errors)} reportes con errores")
+
+
+if __name__ == "__main__":
+    main()
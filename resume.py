@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import importer
+import persistence
+from store import AnswerStore
+
+# Evaluaciones cargadas recientemente, compartidas por las sesiones del proceso
+RESUME_CACHE_SIZE = int(os.getenv("RESUME_CACHE_SIZE", "512"))
+RESUME_CACHE_TTL = float(os.getenv("RESUME_CACHE_TTL", "300"))
+
+# clave de evaluación -> (vencimiento, respuestas, ¿guardada con la clave estable?)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# Última evaluación guardada de un usuario en una sola consulta: por clave estable
+# o, para las evaluaciones anteriores, por nombre y empresa
+def find_assessment(user_info, collection=None):
+    if collection is None:
+        collection = persistence.get_collection()
+    # Índice para las evaluaciones anteriores sin clave estable
+    persistence.ensure_indexes(collection, [("user_info.company", 1), ("user_info.name", 1), ("updated_at", -1)])
+    query = {"$or": [
+        {"_id": persistence.assessment_key(user_info)},
+        {"user_info.company": user_info["company"], "user_info.name": user_info["name"]}
+    ]}
+    # Los documentos anteriores no tienen updated_at: entre ellos, el último insertado
+    cursor = collection.find(query, {"responses": 1}).sort([("updated_at", -1), ("_id", -1)]).limit(1)
+    return next(iter(cursor), None)
+
+
+# Respuestas guardadas de un usuario y si el documento usa la clave estable,
+# desde la caché mientras no venza ni se vuelva a guardar
+def saved_responses(user_info, collection=None):
+    key = persistence.assessment_key(user_info)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            _cache.move_to_end(key)
+            return cached[1], cached[2]
+    document = find_assessment(user_info, collection)
+    responses = tuple(document.get("responses", ())) if document else ()
+    keyed = document is None or document["_id"] == key
+    with _cache_lock:
+        _cache[key] = (now + RESUME_CACHE_TTL, responses, keyed)
+        _cache.move_to_end(key)
+        while len(_cache) > RESUME_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return responses, keyed
+
+
+# Descartar de la caché una evaluación recién guardada
+@persistence.on_save
+def invalidate(key):
+    with _cache_lock:
+        _cache.pop(key, None)
+
+
+# Almacén de respuestas con la última evaluación guardada del usuario (vacío si no hay).
+# Una evaluación anterior sin clave estable queda completa como pendiente de guardar,
+# para migrarla al documento con clave en el próximo guardado
+def load_answers(user_info, collection=None):
+    responses, keyed = saved_responses(user_info, collection)
+    answers = AnswerStore.from_records(responses)
+    if not keyed:
+        answers.mark_changed([code for code, _ in answers.items()])
+    return answers
+
+
+# Almacén de respuestas desde un archivo exportado ({nombre}_respuestas_sgsi.xlsx);
+# las respuestas quedan pendientes de guardar
+def load_workbook_answers(source):
+    responses, _, _ = importer.read_workbook(source)
+    answers = AnswerStore.from_records([{"control": code, "status": status} for code, status in responses.items()])
+    answers.mark_changed(responses)
+    return answers
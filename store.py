@@ -0,0 +1,158 @@
+import sys
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from catalog import catalog as default_catalog
+
+# Código de status para los controles aún no respondidos
+UNSET = 255
+
+
+# Índices precalculados por catálogo: slot -> familia, código/texto -> slot, status -> código
+@lru_cache(maxsize=None)
+def _layout(catalog):
+    families = tuple(catalog.families)
+    family_index = {family: index for index, family in enumerate(families)}
+    slot_family = tuple(family_index[control.family] for control in catalog.controls)
+    slot_index = {control.code: control.slot for control in catalog.controls}
+    slot_index.update({control.text: control.slot for control in catalog.controls})
+    status_index = {status.name: index for index, status in enumerate(catalog.statuses)}
+    return families, slot_family, slot_index, status_index
+
+
+# Almacén compacto de respuestas de una evaluación: un byte de status por control del catálogo
+class AnswerStore:
+    __slots__ = ("_catalog", "_codes", "_counts", "_changed", "_answered")
+
+    def __init__(self, records=None, catalog=default_catalog):
+        self._catalog = catalog
+        families, _, _, status_index = _layout(catalog)
+        # Status de cada control por slot del catálogo
+        self._codes = array("B", [UNSET]) * len(catalog)
+        # Contadores (familia x status) mantenidos en cada upsert
+        self._counts = array("H", [0]) * (len(families) * len(status_index))
+        # Slots modificados desde el último guardado
+        self._changed = set()
+        self._answered = 0
+        for record in records or []:
+            self.upsert(record["control"], record["status"])
+
+    # Construir el almacén desde una evaluación completa recalculando los contadores en bloque
+    @classmethod
+    def from_records(cls, records, catalog=default_catalog):
+        import numpy as np
+        import pandas as pd
+
+        store = cls(catalog=catalog)
+        families, slot_family, slot_index, status_index = _layout(catalog)
+        df = pd.DataFrame(records, columns=["control", "status"])
+        # Aceptar tanto códigos como el texto completo de versiones anteriores
+        slots = df["control"].map(slot_index)
+        missing = slots.isna()
+        if missing.any():
+            slots = slots.fillna(df.loc[missing, "control"].map(lambda value: getattr(catalog.find(value), "slot", None)))
+        df = df.assign(slot=slots, code=df["status"].map(status_index)).dropna().drop_duplicates("slot", keep="last")
+        slots = df["slot"].to_numpy(dtype=np.intp)
+        codes = df["code"].to_numpy(dtype=np.uint8)
+
+        values = np.full(len(catalog), UNSET, dtype=np.uint8)
+        values[slots] = codes
+        store._codes = array("B", values.tobytes())
+        counts = np.bincount(np.asarray(slot_family)[slots] * len(status_index) + codes, minlength=len(families) * len(status_index))
+        store._counts = array("H", counts.astype(np.uint16).tobytes())
+        store._answered = len(slots)
+        return store
+
+    # Insertar o actualizar el status de un control en O(1); devuelve True si cambió
+    def upsert(self, code, status):
+        _, slot_family, _, status_index = _layout(self._catalog)
+        slot = self._catalog.control(code).slot
+        value = status_index[status]
+        previous = self._codes[slot]
+        if previous == value:
+            return False
+        self._codes[slot] = value
+        self._changed.add(slot)
+        base = slot_family[slot] * len(status_index)
+        if previous == UNSET:
+            self._answered += 1
+        else:
+            self._counts[base + previous] -= 1
+        self._counts[base + value] += 1
+        return True
+
+    # Obtener el status de un control en O(1)
+    def get(self, code, default=None):
+        value = self._codes[self._catalog.control(code).slot]
+        return default if value == UNSET else self._catalog.statuses[value].name
+
+    def __contains__(self, code):
+        return self._codes[self._catalog.control(code).slot] != UNSET
+
+    def __len__(self):
+        return self._answered
+
+    # Memoria propia del almacén (el catálogo es compartido entre sesiones y no se cuenta)
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self._codes) + sys.getsizeof(self._counts) + sys.getsizeof(self._changed)
+
+    # Recorrer los pares (código, status) respondidos en el orden del catálogo
+    def items(self):
+        statuses = self._catalog.statuses
+        for control, value in zip(self._catalog.controls, self._codes):
+            if value != UNSET:
+                yield control.code, statuses[value].name
+
+    # Lista de registros {"control", "status"} para exportar; con títulos el texto se expande aquí
+    def records(self, with_titles=False):
+        if with_titles:
+            return [{"control": code, "titulo": self._catalog.title(code), "status": status} for code, status in self.items()]
+        return [{"control": code, "status": status} for code, status in self.items()]
+
+    # Copia de los códigos de status por slot del catálogo (255 = sin responder)
+    def status_codes(self):
+        return bytes(self._codes)
+
+    # Cambios pendientes de guardar (código -> status); se vacían al tomarlos
+    def take_changes(self):
+        controls = self._catalog.controls
+        statuses = self._catalog.statuses
+        changes = {controls[slot].code: statuses[self._codes[slot]].name for slot in sorted(self._changed)}
+        self._changed.clear()
+        return changes
+
+    # Volver a marcar como pendientes cambios que no pudieron guardarse
+    def mark_changed(self, codes):
+        self._changed.update(self._catalog.control(code).slot for code in codes if code in self)
+
+    # Contadores por familia de cláusulas
+    def family_counts(self):
+        families = _layout(self._catalog)[0]
+        width = len(self._catalog.statuses)
+        return {
+            family: {status.name: self._counts[index * width + offset] for offset, status in enumerate(self._catalog.statuses)}
+            for index, family in enumerate(families)
+        }
+
+    # Histograma de toda la evaluación como tupla en el orden de los status (clave de caché de gráficos)
+    def status_histogram(self):
+        width = len(self._catalog.statuses)
+        return tuple(sum(self._counts[offset::width]) for offset in range(width))
+
+    # Histogramas por familia como tupla de (familia, histograma)
+    def family_histograms(self):
+        families = _layout(self._catalog)[0]
+        width = len(self._catalog.statuses)
+        return tuple((family, tuple(self._counts[index * width:(index + 1) * width])) for index, family in enumerate(families))
+
+    # Histograma de status de una sección ("requisitos", "controles") o de toda la evaluación
+    def status_counts(self, section=None):
+        families = _layout(self._catalog)[0]
+        width = len(self._catalog.statuses)
+        total = Counter()
+        for index, family in enumerate(families):
+            if section is None or self._catalog.families[family].section == section:
+                for offset, status in enumerate(self._catalog.statuses):
+                    total[status.name] += self._counts[index * width + offset]
+        return total
@@ -0,0 +1,16 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+
+
+# Colección de respuestas vacía en una base de mongomock propia de cada test
+@pytest.fixture
+def collection():
+    import mongomock
+
+    return mongomock.MongoClient()[f"test_{uuid.uuid4().hex}"]["respuestas"]
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import autosave
+
+USER = {"name": "Ana", "company": "ACME"}
+
+
+# Función de guardado que registra cada intento y falla según la lista de resultados
+class FakeSave:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+        self.saved = threading.Event()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, user_info, changes):
+        self.calls.append((dict(user_info), dict(changes)))
+        self.started.set()
+        self.release.wait(5)
+        if self.failures and self.failures.pop(0):
+            raise RuntimeError("sin conexión")
+        self.saved.set()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("tiempo de espera agotado")
+        time.sleep(0.01)
+
+
+def make_queue(save, **options):
+    options = {"debounce": 0.01, "max_delay": 0.05, "max_retries": 1, "max_backoff": 0.05, **options}
+    return autosave.AutosaveQueue(save, **options)
+
+
+def test_failed_write_is_requeued_and_retried():
+    save = FakeSave(failures=[True])
+    queue = make_queue(save)
+    queue.submit("s1", USER, {"5.1": "Inicial"})
+
+    wait_for(save.saved.is_set)
+    assert [changes for _, changes in save.calls] == [{"5.1": "Inicial"}, {"5.1": "Inicial"}]
+    wait_for(lambda: queue.state("s1")["status"] == autosave.SAVED)
+
+
+def test_failed_write_keeps_newer_changes_submitted_during_the_retry():
+    save = FakeSave(failures=[True])
+    save.release.clear()
+    queue = make_queue(save)
+    queue.submit("s1", USER, {"5.1": "Inicial", "5.2": "Limitado"})
+    wait_for(save.started.is_set)
+
+    # Cambios que llegan mientras se escribe el primer lote (que va a fallar)
+    queue.submit("s1", {"name": "Ana", "company": "ACME Sur"}, {"5.2": "Definido", "5.3": "Optimizado"})
+    save.release.set()
+
+    wait_for(save.saved.is_set)
+    user_info, changes = save.calls[-1]
+    assert changes == {"5.1": "Inicial", "5.2": "Definido", "5.3": "Optimizado"}
+    assert user_info["company"] == "ACME Sur"
+    wait_for(lambda: queue.state("s1")["status"] == autosave.SAVED)
+
+
+def test_flush_all_saves_pending_changes_immediately():
+    save = FakeSave()
+    queue = make_queue(save, debounce=60, max_delay=60)
+    queue.submit("s1", USER, {"5.1": "Inicial"})
+    queue.submit("s2", {"name": "Bo", "company": "ACME"}, {"5.2": "Definido"})
+    assert queue.state("s1")["status"] == autosave.PENDING
+
+    queue.flush_all()
+
+    assert {user_info["name"]: changes for user_info, changes in save.calls} == {"Ana": {"5.1": "Inicial"}, "Bo": {"5.2": "Definido"}}
+    assert queue.state("s1")["status"] == autosave.SAVED
+    assert queue.state("s2")["status"] == autosave.SAVED
+
+
+def test_flush_all_requeues_a_failed_write():
+    save = FakeSave(failures=[True])
+    queue = make_queue(save, debounce=60, max_delay=60, max_backoff=60)
+    queue.submit("s1", USER, {"5.1": "Inicial"})
+
+    queue.flush_all()
+
+    assert queue.state("s1")["status"] == autosave.FAILED
+    queue.flush_all()
+    assert [changes for _, changes in save.calls] == [{"5.1": "Inicial"}, {"5.1": "Inicial"}]
+    assert queue.state("s1")["status"] == autosave.SAVED
+
+
+def test_old_states_are_pruned():
+    save = FakeSave()
+    queue = make_queue(save, debounce=60, max_delay=60, state_ttl=0.05)
+    queue.submit("s1", USER, {"5.1": "Inicial"})
+    queue.flush_all()
+    queue.submit("s2", USER, {"5.2": "Definido"})
+    time.sleep(0.1)
+
+    # El próximo cambio de estado descarta las sesiones guardadas hace más de state_ttl,
+    # pero no las que tienen cambios pendientes
+    queue.submit("s3", USER, {"5.3": "Inicial"})
+    assert queue.state("s1") is None
+    assert queue.state("s2")["status"] == autosave.PENDING
+    assert queue.state("s3")["status"] == autosave.PENDING
+
+
+def test_flush_all_waits_for_the_write_in_flight_of_a_session():
+    save = FakeSave()
+    save.release.clear()
+    queue = make_queue(save)
+    queue.submit("s1", USER, {"5.1": "Inicial"})
+    wait_for(save.started.is_set)
+
+    # Cambios nuevos mientras el lote anterior se está escribiendo
+    queue.submit("s1", USER, {"5.1": "Definido"})
+    flusher = threading.Thread(target=queue.flush_all)
+    flusher.start()
+    time.sleep(0.05)
+    assert len(save.calls) == 1
+
+    save.release.set()
+    flusher.join(5)
+    assert [changes for _, changes in save.calls] == [{"5.1": "Inicial"}, {"5.1": "Definido"}]
+    assert queue.state("s1")["status"] == autosave.SAVED
+
+    # La sesión sigue guardándose automáticamente después de flush_all
+    queue.submit("s1", USER, {"5.2": "Limitado"})
+    wait_for(lambda: len(save.calls) == 3)
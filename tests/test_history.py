@@ -0,0 +1,123 @@
+import random
+import time
+
+import pytest
+
+import history
+import persistence
+from catalog import catalog, status_options
+
+ANA = {"name": "Ana", "company": "ACME"}
+KEY = persistence.assessment_key(ANA)
+CODES = [control.code for control in catalog.controls]
+
+
+@pytest.fixture(autouse=True)
+def empty_trends():
+    history._trends.clear()
+
+
+# Guardados con cambios aleatorios a partir de un estado; devuelve el estado esperado después de cada uno
+def random_saves(collection, count, seed=0, state=None):
+    rng = random.Random(seed)
+    state = dict(state or {})
+    states = []
+    for _ in range(count):
+        changes = {rng.choice(CODES): rng.choice(status_options) for _ in range(rng.randint(1, 6))}
+        persistence.save_changes(ANA, changes, collection=collection)
+        state.update(changes)
+        states.append(dict(state))
+        # Las fechas de MongoDB tienen precisión de milisegundos
+        time.sleep(0.002)
+    return states
+
+
+def deltas(collection):
+    history_collection = persistence.get_history_collection(collection)
+    return list(history_collection.find({"assessment": KEY, "kind": persistence.DELTA}).sort("seq", 1))
+
+
+def test_stale_version_raises_save_conflict(collection):
+    persistence.save_changes(ANA, {"A.5.1": "Inicial"}, collection=collection)
+    stale = collection.find_one({"_id": KEY})
+    persistence.save_changes(ANA, {"A.5.1": "Definido"}, collection=collection)
+
+    # El guardado lee la versión anterior a la del último guardado
+    collection.find_one = lambda *args, **kwargs: stale
+    with pytest.raises(persistence.SaveConflict):
+        persistence.save_changes(ANA, {"A.5.2": "Limitado"}, collection=collection)
+    del collection.find_one
+
+    document = collection.find_one({"_id": KEY})
+    assert document["history_seq"] == 2
+    assert {response["control"]: response["status"] for response in document["responses"]} == {"A.5.1": "Definido"}
+
+
+def test_pending_history_is_completed_by_the_next_save(collection, monkeypatch):
+    flush = persistence._flush_history
+    calls = []
+
+    def failing_flush(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError("sin conexión")
+        flush(*args)
+
+    monkeypatch.setattr(persistence, "_flush_history", failing_flush)
+    with pytest.raises(RuntimeError):
+        persistence.save_changes(ANA, {"A.5.1": "Inicial"}, collection=collection)
+    assert collection.find_one({"_id": KEY})["history_pending"]
+
+    persistence.save_changes(ANA, {"A.5.1": "Definido"}, collection=collection)
+
+    assert "history_pending" not in collection.find_one({"_id": KEY})
+    assert [(entry["seq"], entry["changes"][0]["new"]) for entry in deltas(collection)] == [(1, "Inicial"), (2, "Definido")]
+
+
+def test_snapshot_at_replays_across_checkpoints(collection, monkeypatch):
+    monkeypatch.setattr(persistence, "HISTORY_CHECKPOINT_INTERVAL", 3)
+    states = random_saves(collection, 10)
+
+    history_collection = persistence.get_history_collection(collection)
+    checkpoints = history_collection.count_documents({"assessment": KEY, "kind": persistence.CHECKPOINT})
+    assert checkpoints == 3
+    for entry, state in zip(deltas(collection), states):
+        assert history.snapshot_at(KEY, at=entry["at"], collection=history_collection) == state
+    assert history.snapshot_at(KEY, collection=history_collection) == states[-1]
+
+
+def test_snapshot_at_drops_controls_removed_by_a_replace(collection):
+    persistence.save_changes(ANA, {"A.5.1": "Inicial", "A.5.2": "Definido"}, collection=collection)
+    time.sleep(0.002)
+    persistence.save_changes(ANA, {"A.5.2": "Optimizado"}, collection=collection, replace=True)
+    history_collection = persistence.get_history_collection(collection)
+
+    assert history.snapshot_at(KEY, collection=history_collection) == {"A.5.2": "Optimizado"}
+    _, counts = history.family_trend(KEY, history_collection)
+    assert (counts[-1] == history._family_counts({"A.5.2": "Optimizado"})).all()
+
+
+def test_family_trend_matches_a_full_recount(collection):
+    history_collection = persistence.get_history_collection(collection)
+    states = random_saves(collection, 6, seed=1)
+    history.family_trend(KEY, history_collection)
+    # Los guardados posteriores se agregan a la serie en caché
+    states += random_saves(collection, 6, seed=2, state=states[-1])
+    times, counts = history.family_trend(KEY, history_collection)
+
+    assert len(times) == len(states)
+    for state, trend_counts in zip(states, counts):
+        assert (trend_counts == history._family_counts(state)).all()
+
+
+def test_family_trend_starts_from_the_state_saved_before_the_history(collection):
+    # Evaluación importada sin historial: el primer guardado registra el estado base (seq 0)
+    collection.insert_one({"_id": KEY, "user_info": ANA, "responses": [{"control": "A.5.1", "status": "Inicial"}]})
+    history_collection = persistence.get_history_collection(collection)
+    states = random_saves(collection, 4, seed=3, state={"A.5.1": "Inicial"})
+
+    times, counts = history.family_trend(KEY, history_collection)
+
+    assert len(times) == len(states) + 1
+    for state, trend_counts in zip([{"A.5.1": "Inicial"}, *states], counts):
+        assert (trend_counts == history._family_counts(state)).all()
@@ -0,0 +1,62 @@
+import socket
+import threading
+
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    monkeypatch.setattr(instrumentation, "_textfile_written", 0.0)
+    monkeypatch.setattr(instrumentation, "_server_started", False)
+
+
+class State(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+def test_textfile_errors_do_not_break_the_rerun(enabled, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "METRICS_TEXTFILE", "/nonexistent/dir/x.prom")
+
+    assert instrumentation.start_rerun().finish("s1", State(a=1)) is None
+    assert "archivo de métricas" in caplog.text
+
+
+def test_port_in_use_does_not_break_the_rerun(enabled, monkeypatch, caplog):
+    busy = socket.socket()
+    busy.bind(("127.0.0.1", 0))
+    busy.listen()
+    monkeypatch.setattr(instrumentation, "METRICS_PORT", str(busy.getsockname()[1]))
+    try:
+        assert instrumentation.start_rerun().finish("s1", State()) is None
+    finally:
+        busy.close()
+    assert "servidor de métricas" in caplog.text
+
+
+def test_concurrent_textfile_writes(enabled, monkeypatch, tmp_path, caplog):
+    path = tmp_path / "metrics.prom"
+    monkeypatch.setattr(instrumentation, "METRICS_TEXTFILE", str(path))
+    monkeypatch.setattr(instrumentation, "TEXTFILE_INTERVAL", 0.0)
+    errors = []
+
+    def reruns():
+        try:
+            for _ in range(50):
+                instrumentation.start_rerun().finish(f"s{threading.get_ident()}", State())
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=reruns) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert "No se pudo" not in caplog.text
+    assert "sgsi_rerun_seconds" in path.read_text()
+    assert [entry.name for entry in tmp_path.iterdir()] == ["metrics.prom"]
@@ -0,0 +1,54 @@
+from catalog import catalog
+
+import migrate
+import persistence
+import portfolio
+
+ANA = {"name": "Ana", "company": "ACME"}
+BO = {"name": "Bo", "company": "ACME"}
+
+
+# Documento como los que insertaba la versión anterior en cada clic en "Guardar"
+def legacy_document(user_info, statuses):
+    return {
+        "user_info": {**user_info, "saved": True},
+        "responses": [{"control": catalog.control(code).text, "status": status} for code, status in statuses.items()]
+    }
+
+
+def test_pipelines_ignore_legacy_documents_until_migrated(collection):
+    collection.insert_one(legacy_document(ANA, {"A.5.1": "Inicial"}))
+    collection.insert_one(legacy_document(ANA, {"A.5.1": "Inicial", "A.5.2": "Definido"}))
+    persistence.save_changes(BO, {"A.5.1": "Optimizado"}, collection=collection)
+
+    rows = portfolio.drill_down(control="A.5.1", collection=collection)
+    assert [(row["name"], row["control"], row["status"]) for row in rows] == [("Bo", "A.5.1", "Optimizado")]
+    assert {row["control"] for row in portfolio.control_distribution(collection=collection)} == {"A.5.1"}
+
+
+def test_migrated_legacy_documents_aggregate_by_code_once_per_person(collection):
+    collection.insert_one(legacy_document(ANA, {"A.5.1": "Inicial"}))
+    collection.insert_one(legacy_document(ANA, {"A.5.1": "Limitado", "A.5.2": "Definido"}))
+    collection.insert_one(legacy_document(BO, {"A.5.1": "Optimizado"}))
+
+    stats = migrate.migrate_legacy(collection)
+
+    assert stats == {"legacy": 3, "migrated": 2, "kept": 0, "invalid": 0}
+    assert sorted(document["_id"] for document in collection.find()) == ["acme::ana", "acme::bo"]
+    rows = portfolio.drill_down(control="A.5.1", collection=collection)
+    assert sorted((row["name"], row["status"]) for row in rows) == [("Ana", "Limitado"), ("Bo", "Optimizado")]
+    distribution = {row["status"]: row["count"] for row in portfolio.company_distribution(collection=collection)}
+    assert distribution == {"Limitado": 1, "Definido": 1, "Optimizado": 1}
+    weakest = portfolio.weakest_controls(collection=collection)
+    assert {row["control"] for row in weakest} == {"A.5.1", "A.5.2"}
+
+
+def test_migration_keeps_an_existing_keyed_assessment(collection):
+    persistence.save_changes(ANA, {"A.5.1": "Gestionado"}, collection=collection)
+    collection.insert_one(legacy_document(ANA, {"A.5.1": "Inicial"}))
+
+    stats = migrate.migrate_legacy(collection)
+
+    assert stats["kept"] == 1
+    assert collection.count_documents({}) == 1
+    assert portfolio.drill_down(control="A.5.1", collection=collection)[0]["status"] == "Gestionado"
@@ -0,0 +1,20 @@
+import os
+
+import persistence
+import reports
+
+
+def test_generate_reports_writes_one_file_per_keyed_assessment(collection, tmp_path):
+    persistence.save_changes({"name": "Ana", "company": "ACME – Sur"}, {"A.5.1": "Inicial"}, collection=collection)
+    # Nombres distintos con el mismo nombre de archivo seguro
+    persistence.save_changes({"name": "Ana/Bo", "company": "ACME"}, {"A.5.1": "Definido"}, collection=collection)
+    persistence.save_changes({"name": "Ana Bo", "company": "ACME"}, {"A.5.1": "Optimizado"}, collection=collection)
+    # Documento de la versión anterior: se incorpora con migrate.py, no se reporta aparte
+    collection.insert_one({"user_info": {"name": "Cris", "company": "ACME"}, "responses": []})
+    collection.insert_one({"_id": "sin::usuario", "responses": []})
+
+    paths, errors = reports.generate_reports(str(tmp_path), workers=1, collection=collection)
+
+    assert sorted(os.path.basename(path) for path in paths) == ["ACME_Ana_Bo.pdf", "ACME_Ana_Bo_2.pdf", "ACME_Sur_Ana.pdf"]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths)
+    assert errors == [("sin::usuario", "KeyError: 'user_info'")]
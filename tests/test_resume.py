@@ -0,0 +1,77 @@
+import pytest
+
+from catalog import catalog
+
+import autosave
+import persistence
+import portfolio
+import resume
+
+ANA = {"name": "Ana", "company": "ACME"}
+
+
+# La caché de evaluaciones es del proceso: cada test empieza sin entradas
+@pytest.fixture(autouse=True)
+def empty_cache():
+    resume._cache.clear()
+
+
+def test_first_keyed_save_removes_the_resumed_legacy_document(collection):
+    collection.insert_one({
+        "user_info": {**ANA, "saved": True},
+        "responses": [{"control": catalog.control("A.5.1").text, "status": "Inicial"}]
+    })
+    answers = resume.load_answers(ANA, collection)
+
+    persistence.save_changes(ANA, answers.take_changes(), collection=collection)
+
+    assert [document["_id"] for document in collection.find()] == ["acme::ana"]
+    assert len(portfolio.drill_down(company="ACME", collection=collection)) == 1
+
+
+def legacy_document(statuses):
+    return {
+        "user_info": {**ANA, "saved": True},
+        "responses": [{"control": catalog.control(code).text, "status": status} for code, status in statuses.items()]
+    }
+
+
+def test_first_autosave_after_resuming_a_legacy_document_writes_the_whole_assessment(collection):
+    statuses = {control.code: "Definido" for control in catalog.controls}
+    collection.insert_one(legacy_document(statuses))
+    queue = autosave.AutosaveQueue(lambda user_info, changes: persistence.save_changes(user_info, changes, collection=collection), debounce=60)
+
+    answers = resume.load_answers(ANA, collection)
+    answers.upsert("A.5.1", "Optimizado")
+    queue.submit("s1", ANA, answers.take_changes())
+    queue.flush_all()
+
+    document = collection.find_one({"_id": "acme::ana"})
+    saved = {response["control"]: response["status"] for response in document["responses"]}
+    assert saved == {**statuses, "A.5.1": "Optimizado"}
+    assert collection.count_documents({}) == 1
+
+
+def test_saved_responses_caches_the_keyed_flag(collection):
+    collection.insert_one(legacy_document({"A.5.1": "Inicial"}))
+    assert resume.saved_responses(ANA, collection)[1] is False
+
+    collection.find = lambda *args, **kwargs: pytest.fail("la segunda carga debe salir de la caché")
+    responses, keyed = resume.saved_responses(ANA, collection)
+    assert keyed is False
+    assert len(responses) == 1
+    # Cargada desde la caché, la evaluación anterior sigue quedando pendiente de migrar
+    assert resume.load_answers(ANA, collection).take_changes() == {"A.5.1": "Inicial"}
+
+
+def test_saving_invalidates_the_resume_cache(collection):
+    persistence.save_changes(ANA, {"A.5.1": "Inicial"}, collection=collection)
+    assert resume.load_answers(ANA, collection).get("A.5.1") == "Inicial"
+    assert persistence.assessment_key(ANA) in resume._cache
+
+    persistence.save_changes(ANA, {"A.5.1": "Definido"}, collection=collection)
+
+    assert persistence.assessment_key(ANA) not in resume._cache
+    answers = resume.load_answers(ANA, collection)
+    assert answers.get("A.5.1") == "Definido"
+    assert resume.saved_responses(ANA, collection) == (tuple(collection.find_one()["responses"]), True)
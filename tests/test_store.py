@@ -0,0 +1,87 @@
+import random
+from collections import Counter
+
+from catalog import catalog, status_options
+from store import AnswerStore
+
+CODES = [control.code for control in catalog.controls]
+
+
+# Conteos familia x status recalculados desde cero
+def expected_family_counts(statuses):
+    counts = {family: dict.fromkeys(status_options, 0) for family in catalog.families}
+    for code, status in statuses.items():
+        counts[catalog.control(code).family][status] += 1
+    return counts
+
+
+def random_answers(seed, count=500):
+    rng = random.Random(seed)
+    return [(rng.choice(CODES), rng.choice(status_options)) for _ in range(count)]
+
+
+def test_upsert_moves_one_count_per_change():
+    answers = AnswerStore()
+    assert answers.upsert("4.1", "Inicial")
+    assert not answers.upsert("4.1", "Inicial")
+    assert answers.upsert("4.1", "Definido")
+
+    assert answers.family_counts()["4"]["Inicial"] == 0
+    assert answers.family_counts()["4"]["Definido"] == 1
+    assert len(answers) == 1
+    assert answers.get("4.1") == "Definido"
+
+
+def test_counters_match_a_full_recount_after_random_upserts():
+    answers = AnswerStore()
+    statuses = {}
+    for code, status in random_answers(1):
+        answers.upsert(code, status)
+        statuses[code] = status
+
+    assert answers.family_counts() == expected_family_counts(statuses)
+    assert answers.status_histogram() == tuple(Counter(statuses.values())[status] for status in status_options)
+    assert len(answers) == len(statuses)
+    for section in catalog.sections:
+        in_section = Counter(status for code, status in statuses.items() if catalog.control(code).section == section.id)
+        counts = answers.status_counts(section.id)
+        assert {status: counts[status] for status in status_options} == {status: in_section[status] for status in status_options}
+
+
+def test_from_records_matches_incremental_upserts():
+    records = [{"control": code, "status": status} for code, status in random_answers(2)]
+    incremental = AnswerStore(records)
+    bulk = AnswerStore.from_records(records)
+
+    assert bulk.status_codes() == incremental.status_codes()
+    assert bulk.family_histograms() == incremental.family_histograms()
+    assert len(bulk) == len(incremental)
+
+
+def test_from_records_accepts_legacy_titles_and_ignores_unknown_entries():
+    control = catalog.control("4.1")
+    answers = AnswerStore.from_records([
+        {"control": control.text, "status": "Inicial"},
+        {"control": "no existe", "status": "Inicial"},
+        {"control": "4.2(a)", "status": "no existe"},
+        {"control": "4.1", "status": "Definido"}
+    ])
+
+    assert list(answers.items()) == [("4.1", "Definido")]
+    assert answers.family_counts()["4"]["Definido"] == 1
+    assert sum(answers.status_histogram()) == 1
+
+
+def test_take_changes_and_mark_changed():
+    answers = AnswerStore()
+    answers.upsert("4.2(a)", "Inicial")
+    answers.upsert("4.1", "Limitado")
+
+    assert answers.take_changes() == {"4.1": "Limitado", "4.2(a)": "Inicial"}
+    assert answers.take_changes() == {}
+
+    # Solo se vuelven a marcar los controles respondidos
+    answers.mark_changed(["4.1", "4.2(b)"])
+    assert answers.take_changes() == {"4.1": "Limitado"}
+    # Un almacén construido desde registros guardados no tiene cambios pendientes
+    assert AnswerStore.from_records(answers.records()).take_changes() == {}